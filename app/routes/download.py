@@ -2,7 +2,9 @@ import uuid
 import json
 import asyncio
 import logging
+import re
 import threading
+import urllib3
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import FileResponse, StreamingResponse, Response
 from starlette.background import BackgroundTask
@@ -23,6 +25,13 @@ auth_service = AuthService()
 youtube_service = YouTubeService()
 limiter = Limiter(key_func=get_remote_address)
 
+_UNSAFE_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+# Download files are named "<uuid4>..." until renamed to their title
+_UUID_PREFIX_RE = re.compile(r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+
+# Keep-alive pool for /proxy-image — a slideshow's slides all come from the same few CDN hosts
+_image_http = urllib3.PoolManager(num_pools=4, maxsize=8, headers={'User-Agent': 'Mozilla/5.0'})
+
 
 def _check_premium(db: Session, user_id: str):
     """Only premium (paid) users can download. Raises 403 if not premium."""
@@ -50,14 +59,14 @@ def _cleanup_files_by_id(download_dir: str, download_id: str):
     import os
     if not download_dir or not os.path.isdir(download_dir):
         return
-    for f in os.listdir(download_dir):
-        if f.startswith(download_id):
-            path = os.path.join(download_dir, f)
-            try:
-                os.remove(path)
-                logger.info("Cleanup: removed %s", f)
-            except OSError:
-                pass
+    with os.scandir(download_dir) as it:
+        for entry in it:
+            if entry.name.startswith(download_id):
+                try:
+                    os.remove(entry.path)
+                    logger.info("Cleanup: removed %s", entry.name)
+                except OSError:
+                    pass
 
 
 def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
@@ -67,7 +76,6 @@ def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
     - start_time: scan for orphan files created after this timestamp (for single downloads)
     """
     import os
-    import re
     import time as _time
 
     if not download_dir or not os.path.isdir(download_dir):
@@ -75,8 +83,18 @@ def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
 
     # 1. Remove files & DB rows for known completed downloads (batch/slideshow)
     if completed_ids:
+        # One directory pass for every id, instead of one listing per id
+        id_set = set(completed_ids)
+        with os.scandir(download_dir) as it:
+            for entry in it:
+                m = _UUID_PREFIX_RE.match(entry.name)
+                if m and m.group(1) in id_set:
+                    try:
+                        os.remove(entry.path)
+                        logger.info("Cleanup: removed %s", entry.name)
+                    except OSError:
+                        pass
         for dl_id in completed_ids:
-            _cleanup_files_by_id(download_dir, dl_id)
             try:
                 db.query(DownloadHistory).filter(DownloadHistory.id == dl_id).delete()
             except Exception:
@@ -88,22 +106,20 @@ def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
 
     # 2. Remove orphan files created after start_time that have no DB record
     if start_time:
-        uuid_re = re.compile(
-            r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'
-        )
-        for f in os.listdir(download_dir):
-            m = uuid_re.match(f)
-            if not m:
-                continue
-            path = os.path.join(download_dir, f)
-            if not os.path.isfile(path):
-                continue
-            try:
-                if os.path.getmtime(path) < start_time:
+        # scandir: is_file() comes from the directory listing, so each candidate costs one stat
+        with os.scandir(download_dir) as it:
+            orphans = []
+            for entry in it:
+                m = _UUID_PREFIX_RE.match(entry.name)
+                if not m:
                     continue
-            except OSError:
-                continue
-            file_id = m.group(1)
+                try:
+                    if not entry.is_file() or entry.stat().st_mtime < start_time:
+                        continue
+                except OSError:
+                    continue
+                orphans.append((entry.name, entry.path, m.group(1)))
+        for f, path, file_id in orphans:
             if not db.query(DownloadHistory).filter(DownloadHistory.id == file_id).first():
                 try:
                     os.remove(path)
@@ -200,9 +216,21 @@ def _make_progress_callback(download_id: str):
                     "eta": None,
                 })
 
+        elif status_val == "reencoding":
+            # VP9/AV1 -> H.264 after the merge shares the 90-100% band
+            fraction = d.get("fraction") or 0
+            progress_store.update(download_id, {
+                "status": "downloading",
+                "progress": round(90 + fraction * 10, 1),
+                "phase": "reencoding",
+                "speed": None,
+                "eta": None,
+            })
+
     return callback
 
 
+@progress_store.queued
 def _run_video_download(download_id: str, url: str, format: str, quality: str, user_id: str):
     """Background function that runs the video download and updates progress."""
     import time as _time
@@ -265,6 +293,7 @@ def _run_video_download(download_id: str, url: str, format: str, quality: str, u
         db.close()
 
 
+@progress_store.queued
 def _run_audio_download(download_id: str, url: str, user_id: str):
     """Background function that runs the audio download and updates progress."""
     import time as _time
@@ -463,7 +492,6 @@ def get_downloaded_file(
     db: Session = Depends(get_db)
 ):
     import os
-    import re
 
     MIME_TYPES = {
         '.mp4': 'video/mp4',
@@ -479,7 +507,7 @@ def get_downloaded_file(
     }
 
     def sanitize_filename(name: str) -> str:
-        return re.sub(r'[<>:"/\\|?*]', '', name).strip()
+        return _UNSAFE_FILENAME_RE.sub('', name).strip()
 
     def _cleanup_file(path: str):
         try:
@@ -532,7 +560,6 @@ def proxy_image(
     user_id: str = Depends(auth_service.get_current_user),
 ):
     """Proxy a TikTok CDN image to the browser as a download."""
-    import urllib.request
     from urllib.parse import urlparse
 
     parsed = urlparse(url)
@@ -540,15 +567,15 @@ def proxy_image(
         raise HTTPException(status_code=400, detail="Invalid image URL")
 
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        resp = urllib.request.urlopen(req, timeout=15)
-        content = resp.read()
+        resp = _image_http.request('GET', url, timeout=15)
+        if resp.status >= 400:
+            raise Exception(f"HTTP Error {resp.status}")
+        content = resp.data
         content_type = resp.headers.get('Content-Type', 'image/webp')
     except Exception:
         raise HTTPException(status_code=502, detail="Failed to fetch image")
 
-    import re
-    safe_filename = re.sub(r'[<>:"/\\|?*]', '', filename).strip() or 'image.webp'
+    safe_filename = _UNSAFE_FILENAME_RE.sub('', filename).strip() or 'image.webp'
 
     return Response(
         content=content,
@@ -561,6 +588,7 @@ def proxy_image(
 
 # --- Batch Shorts Download ---
 
+@progress_store.queued
 def _run_batch_download(batch_id: str, video_urls: list, format: str, quality: str, user_id: str):
     """Background function that downloads multiple videos sequentially."""
     import time as _time
@@ -779,6 +807,7 @@ async def batch_progress(batch_id: str):
                     "completed": data.get("completed", 0),
                     "current_title": data.get("current_title", ""),
                     "current_progress": data.get("current_progress", 0),
+                    "phase": data.get("phase", ""),
                     "failed": data.get("failed", []),
                     "completed_downloads": data.get("completed_downloads", []),
                 }
@@ -2,7 +2,9 @@ import uuid
 import json
 import asyncio
 import logging
+import re
 import threading
+import urllib3
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
 from slowapi import Limiter
@@ -14,6 +16,7 @@ from app.models.models import DownloadHistory, User
 from app.services.auth_service import AuthService
 from app.services.instagram_service import InstagramService
 from app.services import progress_store
+from app.services.ttl_cache import TTLCache
 from app.routes.user import trim_user_history
 
 logger = logging.getLogger("turboclip.instagram.routes")
@@ -22,6 +25,9 @@ auth_service = AuthService()
 instagram_service = InstagramService()
 limiter = Limiter(key_func=get_remote_address)
 
+# Download files are named "<uuid4>..." until renamed to their title
+_UUID_PREFIX_RE = re.compile(r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+
 
 def _check_premium(db: Session, user_id: str):
     user = db.query(User).filter(User.id == user_id).first()
@@ -72,28 +78,37 @@ def _cleanup_files_by_id(download_dir: str, download_id: str):
     import os
     if not download_dir or not os.path.isdir(download_dir):
         return
-    for f in os.listdir(download_dir):
-        if f.startswith(download_id):
-            path = os.path.join(download_dir, f)
-            try:
-                os.remove(path)
-                logger.info("Cleanup: removed %s", f)
-            except OSError:
-                pass
+    with os.scandir(download_dir) as it:
+        for entry in it:
+            if entry.name.startswith(download_id):
+                try:
+                    os.remove(entry.path)
+                    logger.info("Cleanup: removed %s", entry.name)
+                except OSError:
+                    pass
 
 
 def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
     """Clean up files after a cancelled or failed download."""
     import os
-    import re
     import time as _time
 
     if not download_dir or not os.path.isdir(download_dir):
         return
 
     if completed_ids:
+        # One directory pass for every id, instead of one listing per id
+        id_set = set(completed_ids)
+        with os.scandir(download_dir) as it:
+            for entry in it:
+                m = _UUID_PREFIX_RE.match(entry.name)
+                if m and m.group(1) in id_set:
+                    try:
+                        os.remove(entry.path)
+                        logger.info("Cleanup: removed %s", entry.name)
+                    except OSError:
+                        pass
         for dl_id in completed_ids:
-            _cleanup_files_by_id(download_dir, dl_id)
             try:
                 db.query(DownloadHistory).filter(DownloadHistory.id == dl_id).delete()
             except Exception:
@@ -104,22 +119,20 @@ def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
             db.rollback()
 
     if start_time:
-        uuid_re = re.compile(
-            r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'
-        )
-        for f in os.listdir(download_dir):
-            m = uuid_re.match(f)
-            if not m:
-                continue
-            path = os.path.join(download_dir, f)
-            if not os.path.isfile(path):
-                continue
-            try:
-                if os.path.getmtime(path) < start_time:
+        # scandir: is_file() comes from the directory listing, so each candidate costs one stat
+        with os.scandir(download_dir) as it:
+            orphans = []
+            for entry in it:
+                m = _UUID_PREFIX_RE.match(entry.name)
+                if not m:
+                    continue
+                try:
+                    if not entry.is_file() or entry.stat().st_mtime < start_time:
+                        continue
+                except OSError:
                     continue
-            except OSError:
-                continue
-            file_id = m.group(1)
+                orphans.append((entry.name, entry.path, m.group(1)))
+        for f, path, file_id in orphans:
             if not db.query(DownloadHistory).filter(DownloadHistory.id == file_id).first():
                 try:
                     os.remove(path)
@@ -208,6 +221,7 @@ def _make_instagram_progress_callback(download_id: str):
 
 # --- Background download functions ---
 
+@progress_store.queued
 def _run_instagram_video_download(download_id: str, url: str, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -252,6 +266,7 @@ def _run_instagram_video_download(download_id: str, url: str, user_id: str):
         db.close()
 
 
+@progress_store.queued
 def _run_instagram_audio_download(download_id: str, url: str, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -313,6 +328,7 @@ def _run_instagram_audio_download(download_id: str, url: str, user_id: str):
         db.close()
 
 
+@progress_store.queued
 def _run_instagram_carousel_download(download_id: str, media_items: list, title: str, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -336,7 +352,8 @@ def _run_instagram_carousel_download(download_id: str, media_items: list, title:
             if cb_status == "downloading_item":
                 idx = d["item_index"]
                 total_items = d["item_total"]
-                pct = (idx / total_items) * 95
+                # Items may download concurrently, so progress tracks completions, not the index
+                pct = (len(completed_downloads) / total_items) * 95
                 progress_store.update(download_id, {
                     "status": "downloading",
                     "progress": round(pct, 1),
@@ -367,9 +384,8 @@ def _run_instagram_carousel_download(download_id: str, media_items: list, title:
                     "title": result['title'],
                 })
 
-                idx = d["item_index"]
                 total_items = d["item_total"]
-                pct = ((idx + 1) / total_items) * 95
+                pct = (len(completed_downloads) / total_items) * 95
                 progress_store.update(download_id, {
                     "status": "downloading",
                     "progress": round(pct, 1),
@@ -408,6 +424,7 @@ def _run_instagram_carousel_download(download_id: str, media_items: list, title:
         db.close()
 
 
+@progress_store.queued
 def _run_instagram_batch_download(batch_id: str, video_urls: list, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -661,6 +678,7 @@ async def instagram_batch_progress(batch_id: str):
                     "completed": data.get("completed", 0),
                     "current_title": data.get("current_title", ""),
                     "current_progress": data.get("current_progress", 0),
+                    "phase": data.get("phase", ""),
                     "failed": data.get("failed", []),
                     "completed_downloads": data.get("completed_downloads", []),
                 }
@@ -696,16 +714,22 @@ def cancel_instagram_download(
 
 # --- Image proxy (Instagram CDN blocks cross-origin) ---
 
-_image_cache: dict = {}
 _IMAGE_CACHE_TTL = 300  # 5 minutes
+_image_cache = TTLCache(maxsize=200, ttl=_IMAGE_CACHE_TTL)  # url -> (data, content_type, etag)
+# Keep-alive pool: a profile grid pulls dozens of thumbnails from the same CDN hosts
+_image_http = urllib3.PoolManager(num_pools=4, maxsize=8, headers={
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+})
 
 
 @router.get("/proxy-image")
-def proxy_instagram_image(url: str):
-    """Proxy Instagram CDN images to avoid cross-origin blocking."""
-    import urllib.request
+def proxy_instagram_image(request: Request, url: str):
+    """Proxy Instagram CDN images to avoid cross-origin blocking.
+
+    Responses carry the CDN's ETag, so a browser revalidating a thumbnail gets
+    a 304 — from our cache, or from the CDN when the entry has expired here.
+    """
     import html as _html
-    import time as _time
     from fastapi.responses import Response
 
     # Unescape HTML entities (&amp; -> &) that may come from HTML-extracted URLs
@@ -714,35 +738,39 @@ def proxy_instagram_image(url: str):
     if not url or 'instagram' not in url and 'fbcdn' not in url and 'cdninstagram' not in url:
         raise HTTPException(status_code=400, detail="Invalid image URL")
 
+    if_none_match = request.headers.get('if-none-match')
+
     # Check cache
     cached = _image_cache.get(url)
-    if cached and _time.time() - cached['ts'] < _IMAGE_CACHE_TTL:
-        return Response(
-            content=cached['data'],
-            media_type=cached['content_type'],
-            headers={"Cache-Control": "public, max-age=300"},
-        )
+    if cached is not None:
+        data, content_type, etag = cached
+        headers = {"Cache-Control": "public, max-age=300"}
+        if etag:
+            headers["ETag"] = etag
+            if if_none_match == etag:
+                return Response(status_code=304, headers=headers)
+        return Response(content=data, media_type=content_type, headers=headers)
 
     try:
-        req = urllib.request.Request(url, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        })
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            content_type = resp.headers.get('Content-Type', 'image/jpeg')
-            data = resp.read()
-
-        # Cache it (limit cache size)
-        if len(_image_cache) > 200:
-            oldest_key = min(_image_cache, key=lambda k: _image_cache[k]['ts'])
-            del _image_cache[oldest_key]
-
-        _image_cache[url] = {'data': data, 'content_type': content_type, 'ts': _time.time()}
-
-        return Response(
-            content=data,
-            media_type=content_type,
-            headers={"Cache-Control": "public, max-age=300"},
-        )
+        # Forward the browser's validator so an unchanged image costs the CDN a 304, not a body
+        # (per-request headers replace the pool's, so keep its User-Agent)
+        req_headers = {**_image_http.headers, 'If-None-Match': if_none_match} if if_none_match else None
+        resp = _image_http.request('GET', url, headers=req_headers, timeout=15)
+        if resp.status == 304:
+            headers = {"Cache-Control": "public, max-age=300", "ETag": if_none_match}
+            return Response(status_code=304, headers=headers)
+        if resp.status >= 400:
+            raise Exception(f"HTTP Error {resp.status}")
+        content_type = resp.headers.get('Content-Type', 'image/jpeg')
+        etag = resp.headers.get('ETag')
+        data = resp.data
+
+        _image_cache[url] = (data, content_type, etag)  # evicts the least recently used past 200
+
+        headers = {"Cache-Control": "public, max-age=300"}
+        if etag:
+            headers["ETag"] = etag
+        return Response(content=data, media_type=content_type, headers=headers)
     except Exception as e:
         logger.warning("Image proxy failed for %s: %s", url[:80], e)
         raise HTTPException(status_code=502, detail="Failed to fetch image")
@@ -2,6 +2,7 @@ import uuid
 import json
 import asyncio
 import logging
+import re
 import threading
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
@@ -22,6 +23,9 @@ auth_service = AuthService()
 tiktok_service = TikTokService()
 limiter = Limiter(key_func=get_remote_address)
 
+# Download files are named "<uuid4>..." until renamed to their title
+_UUID_PREFIX_RE = re.compile(r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+
 
 def _check_premium(db: Session, user_id: str):
     user = db.query(User).filter(User.id == user_id).first()
@@ -71,14 +75,14 @@ def _cleanup_files_by_id(download_dir: str, download_id: str):
     import os
     if not download_dir or not os.path.isdir(download_dir):
         return
-    for f in os.listdir(download_dir):
-        if f.startswith(download_id):
-            path = os.path.join(download_dir, f)
-            try:
-                os.remove(path)
-                logger.info("Cleanup: removed %s", f)
-            except OSError:
-                pass
+    with os.scandir(download_dir) as it:
+        for entry in it:
+            if entry.name.startswith(download_id):
+                try:
+                    os.remove(entry.path)
+                    logger.info("Cleanup: removed %s", entry.name)
+                except OSError:
+                    pass
 
 
 def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
@@ -88,7 +92,6 @@ def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
     - start_time: scan for orphan files created after this timestamp (for single downloads)
     """
     import os
-    import re
     import time as _time
 
     if not download_dir or not os.path.isdir(download_dir):
@@ -96,8 +99,18 @@ def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
 
     # 1. Remove files & DB rows for known completed downloads (batch/slideshow)
     if completed_ids:
+        # One directory pass for every id, instead of one listing per id
+        id_set = set(completed_ids)
+        with os.scandir(download_dir) as it:
+            for entry in it:
+                m = _UUID_PREFIX_RE.match(entry.name)
+                if m and m.group(1) in id_set:
+                    try:
+                        os.remove(entry.path)
+                        logger.info("Cleanup: removed %s", entry.name)
+                    except OSError:
+                        pass
         for dl_id in completed_ids:
-            _cleanup_files_by_id(download_dir, dl_id)
             try:
                 db.query(DownloadHistory).filter(DownloadHistory.id == dl_id).delete()
             except Exception:
@@ -109,22 +122,20 @@ def _cleanup_cancelled(download_dir, db, completed_ids=None, start_time=None):
 
     # 2. Remove orphan files created after start_time that have no DB record
     if start_time:
-        uuid_re = re.compile(
-            r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'
-        )
-        for f in os.listdir(download_dir):
-            m = uuid_re.match(f)
-            if not m:
-                continue
-            path = os.path.join(download_dir, f)
-            if not os.path.isfile(path):
-                continue
-            try:
-                if os.path.getmtime(path) < start_time:
+        # scandir: is_file() comes from the directory listing, so each candidate costs one stat
+        with os.scandir(download_dir) as it:
+            orphans = []
+            for entry in it:
+                m = _UUID_PREFIX_RE.match(entry.name)
+                if not m:
+                    continue
+                try:
+                    if not entry.is_file() or entry.stat().st_mtime < start_time:
+                        continue
+                except OSError:
                     continue
-            except OSError:
-                continue
-            file_id = m.group(1)
+                orphans.append((entry.name, entry.path, m.group(1)))
+        for f, path, file_id in orphans:
             if not db.query(DownloadHistory).filter(DownloadHistory.id == file_id).first():
                 try:
                     os.remove(path)
@@ -200,6 +211,7 @@ def _make_tiktok_progress_callback(download_id: str):
 
 # --- Background download functions ---
 
+@progress_store.queued
 def _run_tiktok_video_download(download_id: str, url: str, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -244,6 +256,7 @@ def _run_tiktok_video_download(download_id: str, url: str, user_id: str):
         db.close()
 
 
+@progress_store.queued
 def _run_tiktok_audio_download(download_id: str, url: str, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -305,6 +318,7 @@ def _run_tiktok_audio_download(download_id: str, url: str, user_id: str):
         db.close()
 
 
+@progress_store.queued
 def _run_tiktok_slideshow_download(download_id: str, url: str, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -321,15 +335,16 @@ def _run_tiktok_slideshow_download(download_id: str, url: str, user_id: str):
             if progress_store.is_cancelled(download_id):
                 raise Exception("Download cancelled by user")
             cb_status = d.get("status", "")
-            if cb_status == "downloading_image":
-                idx = d["image_index"]
+            if cb_status == "image_complete":
+                # Images download concurrently, so progress follows the number stored so far
+                done = d["image_count"]
                 total_img = d["image_total"]
-                pct = ((idx + 1) / total_img) * 85
+                pct = (done / total_img) * 85
                 progress_store.update(download_id, {
                     "status": "downloading",
                     "progress": round(pct, 1),
                     "phase": "downloading_images",
-                    "phase_detail": f"Image {idx + 1} of {total_img}",
+                    "phase_detail": f"Image {done} of {total_img}",
                     "speed": None, "eta": None,
                 })
             elif cb_status == "zipping":
@@ -370,6 +385,7 @@ def _run_tiktok_slideshow_download(download_id: str, url: str, user_id: str):
         db.close()
 
 
+@progress_store.queued
 def _run_tiktok_slideshow_images(download_id: str, image_urls: list, title: str, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -388,21 +404,8 @@ def _run_tiktok_slideshow_images(download_id: str, image_urls: list, title: str,
             if progress_store.is_cancelled(download_id):
                 raise Exception("Download cancelled by user")
             cb_status = d.get("status", "")
-            if cb_status == "downloading_image":
-                idx = d["image_index"]
-                total_img = d["image_total"]
-                pct = (idx / total_img) * 95
-                progress_store.update(download_id, {
-                    "status": "downloading",
-                    "progress": round(pct, 1),
-                    "phase": "downloading_images",
-                    "phase_detail": f"Image {idx + 1} of {total_img}",
-                    "speed": None, "eta": None,
-                    "completed_downloads": completed_downloads,
-                    "saved_count": len(completed_downloads),
-                    "total_count": total_img,
-                })
-            elif cb_status == "image_complete":
+            # One event per finished image (failures are only logged by the service)
+            if cb_status == "image_complete":
                 result = d["result"]
                 # Store in download history so /download/file/{id} can serve it
                 history = DownloadHistory(
@@ -422,13 +425,14 @@ def _run_tiktok_slideshow_images(download_id: str, image_urls: list, title: str,
                     "title": result['title'],
                 })
 
-                idx = d["image_index"]
                 total_img = d["image_total"]
-                pct = ((idx + 1) / total_img) * 95
+                done = len(completed_downloads)
+                pct = (done / total_img) * 95
                 progress_store.update(download_id, {
                     "status": "downloading",
                     "progress": round(pct, 1),
                     "phase": "downloading_images",
+                    "phase_detail": f"Image {done} of {total_img}",
                     "speed": None, "eta": None,
                     "completed_downloads": completed_downloads,
                     "saved_count": len(completed_downloads),
@@ -462,6 +466,7 @@ def _run_tiktok_slideshow_images(download_id: str, image_urls: list, title: str,
         db.close()
 
 
+@progress_store.queued
 def _run_tiktok_batch_download(batch_id: str, video_urls: list, user_id: str):
     import time as _time
     db = SessionLocal()
@@ -510,7 +515,7 @@ def _run_tiktok_batch_download(batch_id: str, video_urls: list, user_id: str):
                 if is_slideshow:
                     result = tiktok_service.download_slideshow(
                         url=url, progress_callback=make_video_callback(i), download_dir=user_dir,
-                        user_cookie=user_cookie,
+                        user_cookie=user_cookie, info=info,
                     )
                     fmt, quality_val = 'zip', 'slideshow'
                 else:
@@ -754,6 +759,7 @@ async def tiktok_batch_progress(batch_id: str):
                     "completed": data.get("completed", 0),
                     "current_title": data.get("current_title", ""),
                     "current_progress": data.get("current_progress", 0),
+                    "phase": data.get("phase", ""),
                     "failed": data.get("failed", []),
                     "completed_downloads": data.get("completed_downloads", []),
                 }
@@ -0,0 +1,36 @@
+import os
+from typing import Dict, Optional
+
+
+def unique_path(target_dir: str, stem: str, ext: str, current: Optional[str] = None) -> str:
+    """Claim `stem{ext}` in target_dir, or the first free `stem (N){ext}`.
+
+    Lists the directory once and probes candidates in memory, then reserves
+    the pick with an O_EXCL create so a concurrent download can't take the
+    same name. `current` is the file being renamed, which may keep its own
+    name (returned unclaimed).
+    """
+    with os.scandir(target_dir) as it:
+        taken = {os.path.normcase(e.name) for e in it}
+    if current:
+        taken.discard(os.path.normcase(current))
+    name = f"{stem}{ext}"
+    counter = 1
+    while True:
+        if os.path.normcase(name) not in taken:
+            if current and os.path.normcase(name) == os.path.normcase(current):
+                return os.path.join(target_dir, name)
+            path = os.path.join(target_dir, name)
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                return path
+            except FileExistsError:
+                pass  # lost a race since the listing; try the next counter
+        name = f"{stem} ({counter}){ext}"
+        counter += 1
+
+
+def scan_download_files(target_dir: str, download_id: str) -> Dict[str, os.DirEntry]:
+    """Snapshot every file belonging to a download in a single scandir pass."""
+    with os.scandir(target_dir) as it:
+        return {e.name: e for e in it if e.name.startswith(download_id)}
@@ -0,0 +1,55 @@
+import functools
+import logging
+import subprocess
+import threading
+from typing import Optional
+
+logger = logging.getLogger("turboclip.hwaccel")
+
+# Re-encodes use every core; more than a couple at once (across all services) just thrash the CPU
+REENCODE_SLOTS = threading.BoundedSemaphore(2)
+
+# Output args for every re-encode: moov atom up front for progressive playback, and a muxing queue deep
+# enough that sparse or late-starting audio doesn't abort with "Too many packets buffered"
+REENCODE_MUX_ARGS = ('-max_muxing_queue_size', '9999', '-movflags', '+faststart')
+
+# Hardware H.264 encoders for the services' _ensure_mp4_h264: HWACCEL name -> (encoder, input args, output args).
+# Listed in the order "auto" tries them.
+HW_ENCODERS = {
+    'nvenc': ('h264_nvenc', ['-hwaccel', 'cuda'], ['-preset', 'p3', '-cq', '23']),
+    'qsv': ('h264_qsv', ['-hwaccel', 'qsv'], ['-preset', 'veryfast', '-global_quality', '23']),
+    'vaapi': ('h264_vaapi', ['-vaapi_device', '/dev/dri/renderD128'], ['-vf', 'format=nv12,hwupload', '-qp', '23']),
+    'videotoolbox': ('h264_videotoolbox', [], ['-q:v', '65']),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def pick_hw_encoder(ffmpeg_bin: str, choice: str) -> Optional[str]:
+    """Return the HW_ENCODERS key to use, or None for plain libx264.
+
+    Checks `ffmpeg -encoders` once per (binary, setting), so a build without
+    the requested encoder falls back cleanly instead of failing on every
+    re-encode, and services sharing one ffmpeg share the probe.
+    """
+    choice = (choice or '').strip().lower()
+    if not choice:
+        return None
+    if choice != 'auto' and choice not in HW_ENCODERS:
+        logger.warning("Unknown HWACCEL=%s — using libx264", choice)
+        return None
+
+    try:
+        result = subprocess.run([ffmpeg_bin, '-hide_banner', '-encoders'],
+                                capture_output=True, timeout=10)
+        available = result.stdout.decode(errors='replace')
+    except Exception as e:
+        logger.warning("Could not list ffmpeg encoders: %s — using libx264", e)
+        return None
+
+    candidates = list(HW_ENCODERS) if choice == 'auto' else [choice]
+    for name in candidates:
+        if f' {HW_ENCODERS[name][0]} ' in available:
+            logger.info("Using hardware H.264 encoder: %s", HW_ENCODERS[name][0])
+            return name
+    logger.warning("HWACCEL=%s not available in this ffmpeg build — using libx264", choice)
+    return None
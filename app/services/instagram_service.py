@@ -1,25 +1,65 @@
 import yt_dlp
 import os
+import asyncio
 import re
+import functools
 import time
 import logging
+import threading
+import contextlib
 import uuid
 import shutil
-import urllib.request
+import urllib3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, Dict, List
 from urllib.parse import urlparse
 from app.settings.config import settings
+from app.services.ttl_cache import TTLCache
+from app.services.download_files import scan_download_files, unique_path
+from app.services.hwaccel import REENCODE_MUX_ARGS
+
+try:
+    import aiohttp
+except ImportError:  # optional — carousel items then download one at a time
+    aiohttp = None
 
 logger = logging.getLogger("turboclip.instagram")
 
-_info_cache: Dict[str, dict] = {}
 _INFO_CACHE_TTL = 600
+_INFO_CACHE_MAX = 512
+_info_cache = TTLCache(maxsize=_INFO_CACHE_MAX, ttl=_INFO_CACHE_TTL)  # keyed by shortcode
+_ydl_local = threading.local()  # per-thread metadata-only YoutubeDL, see _shared_info_ydl
 
 # Reusable requests session for Instagram web API (avoids re-visiting profile page each time)
 _web_session = None
 _web_session_ts = 0.0
 _WEB_SESSION_TTL = 1800  # 30 minutes
 
+_DIRECT_UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+_DIRECT_HEADERS = {'User-Agent': _DIRECT_UA}  # shared, never mutated
+# Direct download extension lookup: bare MIME type -> extension; any other video/* is .mp4,
+# then _direct_ext falls back to the URL path suffix
+_EXT_BY_CT = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/pjpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'video/mp4': '.mp4',
+}
+_DIRECT_EXTS = frozenset(('.jpg', '.jpeg', '.png', '.webp', '.mp4'))
+_CAROUSEL_CONCURRENCY = 8
+
+_SHARE_URL_RE = re.compile(r'https?://(?:www\.)?instagram\.com/[^\s\u4e00-\u9fff\uff00-\uffef]*', re.IGNORECASE)
+_TRAILING_PUNCT_RE = re.compile(r'[,;!?）)》」』\]]+$')
+_PROFILE_PATH_RE = re.compile(r'^/[a-zA-Z0-9_.]+$')
+_SHORTCODE_RE = re.compile(r'/(?:p|reel|reels)/([A-Za-z0-9_-]+)')
+_SANITIZE_BAD_RE = re.compile(r'[<>:"/\\|?*]')
+_SANITIZE_WS_RE = re.compile(r'\s+')
+_HASHTAG_RE = re.compile(r'#(\w+)')
+_COPY_CHUNK = 256 * 1024  # read/write size for streamed downloads
+_FFMPEG_QUIET = ('-hide_banner', '-nostats', '-loglevel', 'error')  # output is discarded anyway
+
 
 class InstagramService:
     def __init__(self):
@@ -29,20 +69,37 @@ class InstagramService:
         self.ffmpeg_dir = None
         if settings.FFMPEG_PATH and os.path.isdir(settings.FFMPEG_PATH):
             self.ffmpeg_dir = settings.FFMPEG_PATH
-        elif shutil.which('ffmpeg'):
-            self.ffmpeg_dir = os.path.dirname(shutil.which('ffmpeg'))
+        else:
+            found = shutil.which('ffmpeg')
+            if found:
+                self.ffmpeg_dir = os.path.dirname(found)
+
+        # Resolve the ffmpeg/ffprobe executables once rather than probing the filesystem per call
+        self._ffmpeg_bin = self._resolve_ff_binary('ffmpeg')
+        self._ffprobe_bin = self._resolve_ff_binary('ffprobe')
+
+        # Shared keep-alive pool for CDN fetches — carousel items mostly come from the same hosts
+        self._http = urllib3.PoolManager(
+            num_pools=10, maxsize=_CAROUSEL_CONCURRENCY,
+            retries=urllib3.Retry(total=2, backoff_factor=0.2),
+        )
+
+    def _resolve_ff_binary(self, name: str) -> str:
+        """Return the path to an FFmpeg tool inside ffmpeg_dir, or the bare name to use PATH."""
+        if self.ffmpeg_dir:
+            candidate = os.path.join(self.ffmpeg_dir, name)
+            if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
+                return candidate
+        return name
 
     # ---- URL helpers ----
 
     @staticmethod
     def _extract_url_from_text(text: str) -> str:
         """Extract an Instagram URL from share text."""
-        match = re.search(
-            r'https?://(?:www\.)?instagram\.com/[^\s\u4e00-\u9fff\uff00-\uffef]*',
-            text, re.IGNORECASE,
-        )
+        match = _SHARE_URL_RE.search(text)
         if match:
-            return re.sub(r'[,;!?）)》」』\]]+$', '', match.group(0))
+            return _TRAILING_PUNCT_RE.sub('', match.group(0))
         return text.strip()
 
     @staticmethod
@@ -58,7 +115,7 @@ class InstagramService:
                 return False
             if '/p/' in path or '/reel/' in path or '/reels/' in path or '/stories/' in path:
                 return False
-            if re.match(r'^/[a-zA-Z0-9_.]+$', path):
+            if _PROFILE_PATH_RE.match(path):
                 return True
             return False
         except Exception:
@@ -67,7 +124,7 @@ class InstagramService:
     @staticmethod
     def _get_shortcode(url: str) -> Optional[str]:
         """Extract shortcode from Instagram URL."""
-        match = re.search(r'/(?:p|reel|reels)/([A-Za-z0-9_-]+)', url)
+        match = _SHORTCODE_RE.search(url)
         return match.group(1) if match else None
 
     @staticmethod
@@ -148,7 +205,7 @@ class InstagramService:
     def _extract_hashtags(description: str) -> list:
         if not description:
             return []
-        return re.findall(r'#(\w+)', description)
+        return _HASHTAG_RE.findall(description)
 
     def get_post_info(self, url: str, user_cookie: Optional[str] = None) -> Dict:
         """Extract info for a single Instagram post/reel.
@@ -158,25 +215,26 @@ class InstagramService:
         """
         url = self._extract_url_from_text(url)
 
-        cached = _info_cache.get(url)
-        if cached and time.time() - cached["_ts"] < _INFO_CACHE_TTL:
-            return cached["data"]
-
         shortcode = self._get_shortcode(url)
         if not shortcode:
             raise Exception("Could not extract Instagram shortcode from URL. Check the URL format.")
 
+        # /p/, /reel/ and /reels/ links (and their query-string variants) share one entry
+        cached = _info_cache.get(shortcode)
+        if cached is not None:
+            return cached
+
         # Method 1: yt-dlp (works well for videos)
         result = self._get_post_info_ytdlp(url, shortcode, user_cookie)
         if result:
-            _info_cache[url] = {"data": result, "_ts": time.time()}
+            _info_cache[shortcode] = result
             return result
 
         # Method 2: Web scraping (handles images/carousels that yt-dlp misses)
         logger.info("yt-dlp returned nothing, trying web scraping for %s", shortcode)
         result = self._get_post_info_web(shortcode, user_cookie)
         if result:
-            _info_cache[url] = {"data": result, "_ts": time.time()}
+            _info_cache[shortcode] = result
             return result
 
         raise Exception(
@@ -184,20 +242,39 @@ class InstagramService:
             "deleted, or temporarily unavailable. Try again later."
         )
 
-    def _get_post_info_ytdlp(self, url: str, shortcode: str, user_cookie: Optional[str] = None) -> Optional[Dict]:
-        """Try extracting post info via yt-dlp (no cookies needed for public content)."""
-        ydl_opts = {
+    def _info_ydl_opts(self) -> dict:
+        opts = {
             'quiet': True,
             'no_warnings': True,
             'extract_flat': False,
         }
         if self.ffmpeg_dir:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
-        cookie_opts = self._get_cookie_opts(user_cookie)
-        ydl_opts.update(cookie_opts)
+            opts['ffmpeg_location'] = self.ffmpeg_dir
+        return opts
+
+    def _shared_info_ydl(self) -> yt_dlp.YoutubeDL:
+        """Return this thread's metadata-only YoutubeDL, creating it on first use.
+
+        Saves rebuilding the extractor registry and opener for every post lookup
+        while never sharing one instance between threads.
+        """
+        ydl = getattr(_ydl_local, 'info', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self._info_ydl_opts())
+            _ydl_local.info = ydl
+        return ydl
+
+    def _get_post_info_ytdlp(self, url: str, shortcode: str, user_cookie: Optional[str] = None) -> Optional[Dict]:
+        """Try extracting post info via yt-dlp (no cookies needed for public content)."""
+        ydl_opts = self._get_cookie_opts(user_cookie)
+        if ydl_opts:
+            ydl_ctx = yt_dlp.YoutubeDL({**self._info_ydl_opts(), **ydl_opts})
+        else:
+            # Anonymous lookups have no per-call options — reuse this thread's instance
+            ydl_ctx = contextlib.nullcontext(self._shared_info_ydl())
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with ydl_ctx as ydl:
                 info = ydl.extract_info(url, download=False)
         except Exception as e:
             logger.info("yt-dlp failed for Instagram %s: %s", shortcode, e)
@@ -923,6 +1000,8 @@ class InstagramService:
         ydl_opts = {
             'format': 'bestvideo[vcodec^=avc]+bestaudio/bestvideo*+bestaudio/best',
             'merge_output_format': 'mp4',
+            # Merger already stream-copies; also move moov up front so the file streams as-is
+            'postprocessor_args': {'merger': ['-movflags', '+faststart']},
             'outtmpl': output_template,
             'quiet': True,
             'no_warnings': True,
@@ -940,17 +1019,21 @@ class InstagramService:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=True)
 
-                downloaded_file = self._find_output_file(target_dir, download_id, 'mp4')
+                # One directory scan serves both the output lookup and the fallback merge
+                entries = scan_download_files(target_dir, download_id)
+                downloaded_file = self._find_output_file(target_dir, download_id, 'mp4', entries)
                 if not downloaded_file:
                     raise Exception("Download completed but output file not found.")
 
                 streams = self._verify_merged_streams(downloaded_file)
+                video_codec = streams['video_codec']  # reused by _ensure_mp4_h264 while the file is unchanged
                 if not streams['has_video'] or not streams['has_audio']:
-                    fallback = self._merge_streams_fallback(target_dir, download_id)
+                    fallback = self._merge_streams_fallback(target_dir, download_id, entries)
                     if fallback:
                         downloaded_file = fallback
+                        video_codec = None
 
-                downloaded_file = self._ensure_mp4_h264(downloaded_file)
+                downloaded_file = self._ensure_mp4_h264(downloaded_file, video_codec)
                 self._cleanup_intermediate_files(target_dir, download_id, downloaded_file)
 
                 title = info.get('title') or (info.get('description') or '')[:80] or 'Instagram Video'
@@ -1050,11 +1133,152 @@ class InstagramService:
 
         safe_title = self._sanitize_filename(title)
         total = len(media_items)
-        results = []
 
-        for i, item in enumerate(media_items):
-            item_id = str(uuid.uuid4())
+        if aiohttp is not None:
+            results = asyncio.run(self._download_carousel_items_async(
+                media_items, target_dir, safe_title, progress_callback, user_cookie,
+            ))
+        else:
+            # No aiohttp: run items on a small thread pool; callbacks stay on this thread
+            by_index: Dict[int, Dict] = {}
+            with ThreadPoolExecutor(max_workers=min(_CAROUSEL_CONCURRENCY, total)) as pool:
+                futures = {}
+                for i, item in enumerate(media_items):
+                    if progress_callback:
+                        progress_callback({
+                            "status": "downloading_item",
+                            "item_index": i,
+                            "item_total": total,
+                        })
+                    futures[pool.submit(
+                        self._download_carousel_item, i, total, item, target_dir, safe_title, user_cookie,
+                    )] = i
+                try:
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            logger.warning("Failed to download carousel item %d/%d: %s", i + 1, total, e)
+                            continue
+                        by_index[i] = result
+                        if progress_callback:
+                            progress_callback({
+                                "status": "item_complete",
+                                "item_index": i,
+                                "item_total": total,
+                                "result": result,
+                            })
+                except BaseException:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+            results = [by_index[i] for i in sorted(by_index)]
 
+        if not results:
+            raise Exception("Failed to download any carousel items.")
+
+        return {
+            'results': results,
+            'saved_count': len(results),
+            'total_count': total,
+        }
+
+    def _download_carousel_item(self, i: int, total: int, item: dict, target_dir: str,
+                                safe_title: str, user_cookie: Optional[str] = None) -> Dict:
+        """Download one carousel item (video via yt-dlp, image via direct HTTP). Raises on failure."""
+        item_id = str(uuid.uuid4())
+        item_type = item.get('type', 'image')
+        direct_url = item.get('direct_url') or item.get('url', '')
+
+        if item_type == 'video' and direct_url:
+            # Download video via yt-dlp (use the post URL for yt-dlp, not CDN URL)
+            video_url = item.get('url') or direct_url
+            output_template = os.path.join(target_dir, f'{item_id}.%(ext)s')
+            ydl_opts = {
+                'format': 'bestvideo[vcodec^=avc]+bestaudio/bestvideo*+bestaudio/best',
+                'merge_output_format': 'mp4',
+                # Merger already stream-copies; also move moov up front so the file streams as-is
+                'postprocessor_args': {'merger': ['-movflags', '+faststart']},
+                'outtmpl': output_template,
+                'quiet': True,
+                'no_warnings': True,
+            }
+            if self.ffmpeg_dir:
+                ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
+            cookie_opts = self._get_cookie_opts(user_cookie)
+            ydl_opts.update(cookie_opts)
+
+            try:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    ydl.extract_info(video_url, download=True)
+            finally:
+                self._cleanup_cookie_opts(cookie_opts)
+
+            file_path = self._find_output_file(target_dir, item_id, 'mp4')
+            if not file_path:
+                # Fallback: try downloading the direct video URL via HTTP
+                file_path = self._download_direct_url(direct_url, target_dir, item_id, '.mp4')
+
+            if not file_path:
+                raise Exception("Video download failed.")
+        else:
+            # Download image via direct HTTP
+            if not direct_url:
+                raise Exception("No URL for image item.")
+
+            file_path = self._download_direct_url(direct_url, target_dir, item_id)
+            if not file_path:
+                raise Exception("Image download failed.")
+
+        return self._carousel_item_result(i, total, item_id, file_path, safe_title)
+
+    @staticmethod
+    def _carousel_item_result(i: int, total: int, item_id: str, file_path: str, safe_title: str) -> Dict:
+        """Build the per-item result dict for download_carousel_items."""
+        ext = os.path.splitext(file_path)[1]
+        result = {
+            'download_id': item_id,
+            'title': f"{safe_title}_{i + 1}{ext}",
+            'file_path': file_path,
+            'file_size': os.path.getsize(file_path),
+            'format': ext.lstrip('.'),
+        }
+        logger.info("Saved carousel item %d/%d: %s", i + 1, total, result['title'])
+        return result
+
+    async def _download_carousel_items_async(
+        self,
+        media_items: list,
+        target_dir: str,
+        safe_title: str,
+        progress_callback: Optional[callable] = None,
+        user_cookie: Optional[str] = None,
+    ) -> List[Dict]:
+        """Fetch all carousel items concurrently.
+
+        Images stream over one pooled aiohttp session; videos still go through
+        yt-dlp, each in a worker thread. Results keep the original item order;
+        failed items are logged and skipped.
+        """
+        total = len(media_items)
+        results: List[Optional[Dict]] = [None] * total
+        sem = asyncio.Semaphore(_CAROUSEL_CONCURRENCY)
+
+        async def fetch_image(session, i: int, url: str) -> Dict:
+            item_id = str(uuid.uuid4())
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                ext = self._direct_ext(url, resp.headers.get('Content-Type', ''))
+                file_path = os.path.join(target_dir, f"{item_id}{ext}")
+                written = 0
+                with open(file_path, 'wb', buffering=0) as f:
+                    async for chunk in resp.content.iter_chunked(_COPY_CHUNK):
+                        written += f.write(chunk)
+            if not written:
+                raise Exception("Image download failed.")
+            return self._carousel_item_result(i, total, item_id, file_path, safe_title)
+
+        async def fetch_one(session, i: int, item: dict):
             if progress_callback:
                 progress_callback({
                     "status": "downloading_item",
@@ -1062,134 +1286,77 @@ class InstagramService:
                     "item_total": total,
                 })
 
+            direct_url = item.get('direct_url') or item.get('url', '')
             try:
-                item_type = item.get('type', 'image')
-                direct_url = item.get('direct_url') or item.get('url', '')
-
-                if item_type == 'video' and direct_url:
-                    # Download video via yt-dlp (use the post URL for yt-dlp, not CDN URL)
-                    video_url = item.get('url') or direct_url
-                    output_template = os.path.join(target_dir, f'{item_id}.%(ext)s')
-                    ydl_opts = {
-                        'format': 'bestvideo[vcodec^=avc]+bestaudio/bestvideo*+bestaudio/best',
-                        'merge_output_format': 'mp4',
-                        'outtmpl': output_template,
-                        'quiet': True,
-                        'no_warnings': True,
-                    }
-                    if self.ffmpeg_dir:
-                        ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
-                    cookie_opts = self._get_cookie_opts(user_cookie)
-                    ydl_opts.update(cookie_opts)
-
-                    try:
-                        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                            ydl.extract_info(video_url, download=True)
-                    finally:
-                        self._cleanup_cookie_opts(cookie_opts)
-
-                    file_path = self._find_output_file(target_dir, item_id, 'mp4')
-                    if not file_path:
-                        # Fallback: try downloading the direct video URL via HTTP
-                        file_path = self._download_direct_url(direct_url, target_dir, item_id, '.mp4')
-
-                    if not file_path:
-                        raise Exception("Video download failed.")
-
-                    file_size = os.path.getsize(file_path)
-                    display_name = f"{safe_title}_{i + 1}.mp4"
-
-                    result = {
-                        'download_id': item_id,
-                        'title': display_name,
-                        'file_path': file_path,
-                        'file_size': file_size,
-                        'format': 'mp4',
-                    }
-                else:
-                    # Download image via direct HTTP
-                    if not direct_url:
-                        raise Exception("No URL for image item.")
-
-                    file_path = self._download_direct_url(direct_url, target_dir, item_id)
-                    if not file_path:
-                        raise Exception("Image download failed.")
-
-                    file_size = os.path.getsize(file_path)
-                    ext = os.path.splitext(file_path)[1]
-                    display_name = f"{safe_title}_{i + 1}{ext}"
-
-                    result = {
-                        'download_id': item_id,
-                        'title': display_name,
-                        'file_path': file_path,
-                        'file_size': file_size,
-                        'format': ext.lstrip('.'),
-                    }
-
-                results.append(result)
-                logger.info("Saved carousel item %d/%d: %s", i + 1, total, result['title'])
-
-                if progress_callback:
-                    progress_callback({
-                        "status": "item_complete",
-                        "item_index": i,
-                        "item_total": total,
-                        "result": result,
-                    })
-
+                async with sem:
+                    if item.get('type', 'image') != 'video' and direct_url:
+                        result = await fetch_image(session, i, direct_url)
+                    else:
+                        result = await asyncio.to_thread(
+                            self._download_carousel_item, i, total, item, target_dir, safe_title, user_cookie,
+                        )
             except Exception as e:
                 logger.warning("Failed to download carousel item %d/%d: %s", i + 1, total, e)
+                return
 
-        if not results:
-            raise Exception("Failed to download any carousel items.")
+            results[i] = result
+            # Outside the try: a cancel raised by the callback must abort the whole batch
+            if progress_callback:
+                progress_callback({
+                    "status": "item_complete",
+                    "item_index": i,
+                    "item_total": total,
+                    "result": result,
+                })
 
-        return {
-            'results': results,
-            'saved_count': len(results),
-            'total_count': total,
-        }
+        connector = aiohttp.TCPConnector(limit=_CAROUSEL_CONCURRENCY, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            headers=_DIRECT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=30),
+        ) as session:
+            await asyncio.gather(*(fetch_one(session, i, item) for i, item in enumerate(media_items)))
+
+        return [r for r in results if r is not None]
+
+    @staticmethod
+    def _direct_ext(url: str, content_type: str, forced_ext: Optional[str] = None) -> str:
+        """Pick a file extension for a direct CDN download from Content-Type, then the URL path."""
+        if forced_ext:
+            return forced_ext
+        mime = content_type.partition(';')[0].strip().lower()
+        ext = _EXT_BY_CT.get(mime)
+        if ext:
+            return ext
+        if mime.startswith('video/'):
+            return '.mp4'
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        return ext if ext in _DIRECT_EXTS else '.jpg'
 
     def _download_direct_url(self, url: str, target_dir: str, file_id: str,
                               forced_ext: Optional[str] = None) -> Optional[str]:
         """Download a file from a direct URL via HTTP. Returns file path or None."""
         try:
-            req = urllib.request.Request(url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            })
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                content_type = resp.headers.get('Content-Type', '')
-
-                if forced_ext:
-                    ext = forced_ext
-                elif 'jpeg' in content_type or 'jpg' in content_type:
-                    ext = '.jpg'
-                elif 'png' in content_type:
-                    ext = '.png'
-                elif 'webp' in content_type:
-                    ext = '.webp'
-                elif 'mp4' in content_type or 'video' in content_type:
-                    ext = '.mp4'
-                else:
-                    # Try from URL path
-                    url_path = urlparse(url).path.lower()
-                    ext = '.jpg'  # default
-                    for candidate in ('.jpg', '.jpeg', '.png', '.webp', '.mp4'):
-                        if candidate in url_path:
-                            ext = candidate
-                            break
+            resp = self._http.request('GET', url, headers=_DIRECT_HEADERS,
+                                      timeout=30, preload_content=False)
+            try:
+                if resp.status >= 400:
+                    raise Exception(f"HTTP Error {resp.status}: {resp.reason}")
+                ext = self._direct_ext(url, resp.headers.get('Content-Type', ''), forced_ext)
 
                 file_path = os.path.join(target_dir, f"{file_id}{ext}")
-                with open(file_path, 'wb') as f:
-                    while True:
-                        chunk = resp.read(8192)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-
-            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                return file_path
-            return None
+                written = 0
+                # Unbuffered: the chunks are already large, so a Python-level buffer only adds a copy
+                with open(file_path, 'wb', buffering=0) as f:
+                    while chunk := resp.read(_COPY_CHUNK):
+                        written += f.write(chunk)
+            except BaseException:
+                resp.close()  # never hand a half-read connection back to the pool
+                raise
+            finally:
+                resp.release_conn()
+
+            return file_path if written else None
         except Exception as e:
             logger.warning("Direct URL download failed: %s", e)
             return None
@@ -1592,16 +1759,10 @@ class InstagramService:
         import subprocess
         import json as _json
 
-        ffprobe = 'ffprobe'
-        if self.ffmpeg_dir:
-            ffprobe_path = os.path.join(self.ffmpeg_dir, 'ffprobe')
-            if os.path.exists(ffprobe_path) or os.path.exists(ffprobe_path + '.exe'):
-                ffprobe = ffprobe_path
-
-        result = {"has_video": False, "has_audio": False}
+        result = {"has_video": False, "has_audio": False, "video_codec": None}
         try:
             proc = subprocess.run(
-                [ffprobe, '-v', 'quiet', '-show_streams', '-of', 'json', file_path],
+                [self._ffprobe_bin, '-v', 'quiet', '-show_streams', '-of', 'json', file_path],
                 capture_output=True, text=True, timeout=15
             )
             if proc.returncode != 0:
@@ -1610,27 +1771,39 @@ class InstagramService:
             for stream in data.get('streams', []):
                 if stream.get('codec_type') == 'video':
                     result['has_video'] = True
+                    result['video_codec'] = stream.get('codec_name', '')
                 elif stream.get('codec_type') == 'audio':
                     result['has_audio'] = True
         except Exception:
             pass
         return result
 
-    def _merge_streams_fallback(self, target_dir: str, download_id: str) -> Optional[str]:
+    def _probe_audio_codec(self, file_path: str) -> Optional[str]:
+        """Return the codec name of the first audio stream, or None if ffprobe can't tell."""
         import subprocess
+        try:
+            proc = subprocess.run(
+                [self._ffprobe_bin, '-v', 'quiet', '-select_streams', 'a:0',
+                 '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', file_path],
+                capture_output=True, timeout=10
+            )
+            return proc.stdout.strip().decode(errors='replace') or None
+        except Exception:
+            return None
 
-        ffmpeg_bin = 'ffmpeg'
-        if self.ffmpeg_dir:
-            candidate = os.path.join(self.ffmpeg_dir, 'ffmpeg')
-            if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
-                ffmpeg_bin = candidate
+    def _merge_streams_fallback(self, target_dir: str, download_id: str,
+                                entries: Optional[Dict[str, os.DirEntry]] = None) -> Optional[str]:
+        import subprocess
+
+        if entries is None:
+            entries = scan_download_files(target_dir, download_id)
 
         video_file = None
         audio_file = None
-        for f in os.listdir(target_dir):
-            if not f.startswith(download_id) or f.endswith('.part'):
+        for f, entry in entries.items():
+            if f.endswith('.part'):
                 continue
-            path = os.path.join(target_dir, f)
+            path = entry.path
             parts = f[len(download_id):]
             if parts.count('.') <= 1:
                 continue
@@ -1644,11 +1817,16 @@ class InstagramService:
             return None
 
         merged_path = os.path.join(target_dir, f'{download_id}.mp4')
+        # AAC audio can go into the MP4 as-is; only other codecs need transcoding
+        if self._probe_audio_codec(audio_file) == 'aac':
+            audio_args = ['-c:a', 'copy']
+        else:
+            audio_args = ['-c:a', 'aac', '-b:a', '192k']
         try:
             subprocess.run(
-                [ffmpeg_bin, '-i', video_file, '-i', audio_file,
-                 '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k', '-y', merged_path],
-                capture_output=True, timeout=600
+                [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', video_file, '-i', audio_file,
+                 '-c:v', 'copy', *audio_args, '-movflags', '+faststart', '-y', merged_path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=600
             )
             if os.path.exists(merged_path) and os.path.getsize(merged_path) > 0:
                 return merged_path
@@ -1658,50 +1836,57 @@ class InstagramService:
 
     def _cleanup_intermediate_files(self, target_dir: str, download_id: str, final_file: str):
         final_basename = os.path.basename(final_file)
-        for f in os.listdir(target_dir):
-            if f.startswith(download_id) and f != final_basename:
+        for f, entry in scan_download_files(target_dir, download_id).items():
+            if f != final_basename:
                 try:
-                    os.remove(os.path.join(target_dir, f))
+                    os.remove(entry.path)
                 except OSError:
                     pass
 
-    def _ensure_mp4_h264(self, file_path: str) -> str:
+    def _ensure_mp4_h264(self, file_path: str, codec: Optional[str] = None) -> str:
         import subprocess
 
-        ffprobe = 'ffprobe'
-        if self.ffmpeg_dir:
-            ffprobe_path = os.path.join(self.ffmpeg_dir, 'ffprobe')
-            if os.path.exists(ffprobe_path) or os.path.exists(ffprobe_path + '.exe'):
-                ffprobe = ffprobe_path
-
-        try:
-            result = subprocess.run(
-                [ffprobe, '-v', 'quiet', '-select_streams', 'v:0',
-                 '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', file_path],
-                capture_output=True, text=True, timeout=10
-            )
-            codec = result.stdout.strip()
-            if codec in ('h264', 'avc1', ''):
+        # Skip the probe when the caller already knows the codec from _verify_merged_streams
+        if codec is None:
+            try:
+                result = subprocess.run(
+                    [self._ffprobe_bin, '-v', 'quiet', '-select_streams', 'v:0',
+                     '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', file_path],
+                    capture_output=True, text=True, timeout=10
+                )
+                codec = result.stdout.strip()
+            except Exception:
                 return file_path
-        except Exception:
+        root, ext = os.path.splitext(file_path)
+        fixed_path = root + '_fixed.mp4'
+        if codec in ('h264', 'avc1'):
+            if ext.lower() == '.mp4':
+                return file_path
+            # Right codec, wrong container: copy the streams instead of re-encoding
+            attempts = [
+                [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', file_path, '-c', 'copy', '-movflags', '+faststart', '-y', fixed_path],
+                [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', file_path, '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k',
+                 '-movflags', '+faststart', '-y', fixed_path],
+            ]
+        elif not codec:
             return file_path
-
-        fixed_path = file_path.replace('.mp4', '_fixed.mp4')
-        ffmpeg_bin = 'ffmpeg'
-        if self.ffmpeg_dir:
-            candidate = os.path.join(self.ffmpeg_dir, 'ffmpeg')
-            if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
-                ffmpeg_bin = candidate
+        else:
+            attempts = [
+                [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', file_path, '-c:v', 'libx264', '-preset', 'ultrafast',
+                 '-crf', '23', '-c:a', 'copy', *REENCODE_MUX_ARGS, '-y', fixed_path],
+            ]
 
         try:
-            subprocess.run(
-                [ffmpeg_bin, '-i', file_path, '-c:v', 'libx264', '-preset', 'ultrafast',
-                 '-crf', '23', '-c:a', 'copy', '-y', fixed_path],
-                capture_output=True, timeout=600
-            )
+            for cmd in attempts:
+                result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=600)
+                if result.returncode == 0:
+                    break
             if os.path.exists(fixed_path) and os.path.getsize(fixed_path) > 0:
-                os.remove(file_path)
-                os.rename(fixed_path, file_path)
+                mp4_path = root + '.mp4'
+                os.replace(fixed_path, mp4_path)
+                if mp4_path != file_path:
+                    os.remove(file_path)
+                    file_path = mp4_path
             else:
                 if os.path.exists(fixed_path):
                     os.remove(fixed_path)
@@ -1711,9 +1896,11 @@ class InstagramService:
 
         return file_path
 
-    def _sanitize_filename(self, name: str) -> str:
-        name = re.sub(r'[<>:"/\\|?*]', '', name)
-        name = re.sub(r'\s+', ' ', name).strip()
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _sanitize_filename(name: str) -> str:
+        name = _SANITIZE_BAD_RE.sub('', name)
+        name = _SANITIZE_WS_RE.sub(' ', name).strip()
         if len(name) > 200:
             name = name[:200].strip()
         return name or 'untitled'
@@ -1724,32 +1911,38 @@ class InstagramService:
         target_dir = os.path.dirname(file_path)
         ext = os.path.splitext(file_path)[1]
         safe_title = self._sanitize_filename(title)
-        new_path = os.path.join(target_dir, f"{safe_title}{ext}")
-        if os.path.exists(new_path) and os.path.abspath(new_path) != os.path.abspath(file_path):
-            counter = 1
-            while os.path.exists(new_path):
-                new_path = os.path.join(target_dir, f"{safe_title} ({counter}){ext}")
-                counter += 1
+        new_path = None
         try:
-            os.rename(file_path, new_path)
+            new_path = unique_path(target_dir, safe_title, ext, current=os.path.basename(file_path))
+            # new_path is already reserved, so replace it rather than checking again
+            os.replace(file_path, new_path)
+            logger.info("Renamed: %s -> %s", os.path.basename(file_path), os.path.basename(new_path))
             return new_path
-        except Exception:
+        except Exception as e:
+            logger.warning("Failed to rename file: %s", e)
+            if new_path and new_path != file_path and os.path.exists(file_path):
+                try:
+                    os.remove(new_path)  # drop the empty placeholder
+                except OSError:
+                    pass
             return file_path
 
-    def _find_output_file(self, target_dir: str, download_id: str, expected_ext: str) -> Optional[str]:
-        expected_path = os.path.join(target_dir, f'{download_id}.{expected_ext}')
-        if os.path.exists(expected_path):
-            return expected_path
-        candidates = []
-        for f in os.listdir(target_dir):
-            if f.startswith(download_id) and not f.endswith('.part'):
-                parts = f[len(download_id):]
-                if parts.count('.') <= 1:
-                    candidates.append(os.path.join(target_dir, f))
-        if not candidates:
-            for f in os.listdir(target_dir):
-                if f.startswith(download_id) and not f.endswith('.part'):
-                    candidates.append(os.path.join(target_dir, f))
-        if candidates:
-            return max(candidates, key=os.path.getsize)
-        return None
+    def _find_output_file(self, target_dir: str, download_id: str, expected_ext: str,
+                          entries: Optional[Dict[str, os.DirEntry]] = None) -> Optional[str]:
+        if entries is None:
+            entries = scan_download_files(target_dir, download_id)
+        expected = entries.get(f'{download_id}.{expected_ext}')
+        if expected is not None:
+            return expected.path
+        # One pass: largest final-looking file (single extension), else largest of anything
+        best = best_any = None  # (size, path)
+        for f, entry in entries.items():
+            if f.endswith('.part'):
+                continue
+            size = entry.stat().st_size
+            if best_any is None or size > best_any[0]:
+                best_any = (size, entry.path)
+            if f[len(download_id):].count('.') <= 1 and (best is None or size > best[0]):
+                best = (size, entry.path)
+        pick = best or best_any
+        return pick[1] if pick else None
@@ -1,5 +1,9 @@
+import functools
+import threading
 import time
-from typing import Optional, Dict
+from collections import deque
+from typing import Callable, Optional, Dict
+from app.settings.config import settings
 
 # In-memory progress tracking for active downloads
 # Key: download_id, Value: progress data dict
@@ -8,6 +12,14 @@ _store: Dict[str, dict] = {}
 # Auto-cleanup threshold (seconds)
 _MAX_AGE = 3600  # 1 hour
 
+# Downloads running at once across every platform; the rest wait their turn instead of
+# contending for disk bandwidth and RAM (each one can be yt-dlp + ffmpeg). Waiters hold a
+# ticket in _slot_queue and a slot only goes to the ticket at its head, so jobs start in
+# submission order.
+_free_slots = settings.MAX_CONCURRENT_DOWNLOADS
+_slot_queue: deque = deque()
+_slot_cond = threading.Condition()
+
 
 def update(download_id: str, data: dict):
     """Update progress for a download."""
@@ -51,3 +63,46 @@ def _cleanup():
     ]
     for did in expired:
         del _store[did]
+
+
+def queued(fn: Callable) -> Callable:
+    """Run a background download job (first argument: its download/batch id) under a download slot.
+
+    While all slots are busy the job reports phase "queued"; cancelling it there
+    ends it without starting the download.
+    """
+    @functools.wraps(fn)
+    def wrapper(download_id: str, *args, **kwargs):
+        global _free_slots
+        ticket = object()
+        with _slot_cond:
+            _slot_queue.append(ticket)
+            waited = not (_free_slots and _slot_queue[0] is ticket)
+            if waited:
+                update(download_id, {"status": "downloading", "progress": 0, "phase": "queued"})
+            while not (_free_slots and _slot_queue[0] is ticket):
+                _slot_cond.wait(timeout=1)
+                if is_cancelled(download_id):
+                    _slot_queue.remove(ticket)
+                    _slot_cond.notify_all()  # the job behind us may be at the head now
+                    update(download_id, {
+                        "status": "error",
+                        "progress": 0,
+                        "phase": "error",
+                        "error": "Download cancelled by user",
+                    })
+                    return None
+            _slot_queue.popleft()
+            _free_slots -= 1
+            _slot_cond.notify_all()  # the next ticket may fit in another free slot
+        if waited:
+            # update() merges, so move off "queued" before the job's own updates land
+            update(download_id, {"phase": "starting"})
+        try:
+            return fn(download_id, *args, **kwargs)
+        finally:
+            with _slot_cond:
+                _free_slots += 1
+                _slot_cond.notify_all()
+
+    return wrapper
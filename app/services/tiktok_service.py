@@ -1,21 +1,131 @@
 import yt_dlp
 from yt_dlp.extractor.tiktok import TikTokIE
 import os
+import asyncio
 import re
+import functools
+import hashlib
 import time
 import logging
+import threading
 import uuid
 import shutil
+import struct
 import zipfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import urllib.request
-from typing import Optional, Dict, List
+import urllib3
+from typing import Optional, Dict, List, Set, Tuple
 from urllib.parse import urlparse
 from app.settings.config import settings
+from app.services.ttl_cache import TTLCache
+from app.services.download_files import scan_download_files, unique_path
+from app.services.hwaccel import HW_ENCODERS, REENCODE_MUX_ARGS, REENCODE_SLOTS, pick_hw_encoder
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:  # optional — falls back to the regex <script> scan
+    HTMLParser = None
+
+try:
+    import aiohttp
+except ImportError:  # optional — slideshow images then download one at a time
+    aiohttp = None
+
+try:
+    import av
+except ImportError:  # optional — stream probes then fork ffprobe
+    av = None
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # optional — stdlib json is ~2-3x slower on the item_list payload
+    from json import loads as _json_loads
 
 logger = logging.getLogger("turboclip.tiktok")
 
-_info_cache: Dict[str, dict] = {}
 _INFO_CACHE_TTL = 600
+_INFO_CACHE_MAX = 512
+_info_cache = TTLCache(maxsize=_INFO_CACHE_MAX, ttl=_INFO_CACHE_TTL)
+# Single-flight for cache misses: url -> Event set once the leading lookup finishes
+_info_inflight: Dict[str, threading.Event] = {}
+_info_inflight_lock = threading.Lock()
+_INFO_INFLIGHT_WAIT = 60  # seconds a follower waits before giving up and extracting itself
+
+# Short-link redirects and fully prepared URLs. Bounded in time as well as size: a share link
+# that lands on a login/captcha/region page must not stay broken for the life of the process
+_REDIRECT_CACHE_TTL = 600
+_redirect_cache = TTLCache(maxsize=1024, ttl=_REDIRECT_CACHE_TTL)
+_prepared_url_cache = TTLCache(maxsize=1024, ttl=_REDIRECT_CACHE_TTL)
+
+# Profile grids: (profile_url, cookie digest) -> (slots, playlist exhausted). `slots` is a prefix of
+# the playlist with one item per entry (None where an entry was unusable), so offsets stay positions
+_profile_cache = TTLCache(maxsize=256, ttl=300)
+_PROFILE_PREFETCH = 90  # first fetch covers a few scroll pages (yt-dlp pages TikTok in 30s)
+
+# Slideshow image extension lookup: Content-Type -> extension, plus a URL-suffix fallback
+_EXT_BY_CT = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+}
+_EXT_BY_SUFFIX = {'jpg': '.jpg', 'jpeg': '.jpg', 'png': '.png', 'webp': '.webp'}
+_COPY_CHUNK = 256 * 1024  # read/write size for streamed downloads
+_ZIP_COPY_CHUNK = 1024 * 1024
+_MAX_IMAGE_BYTES = 50 * 1024 * 1024  # a slide is a few hundred KiB; anything this big is bogus
+_IMAGE_UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+_IMAGE_HEADERS = {'User-Agent': _IMAGE_UA}  # shared, never mutated
+_SLIDESHOW_CONCURRENCY = 8
+_PROGRESS_INTERVAL = 0.2  # seconds between routine progress callbacks (cancel checks ride on them too)
+
+# On-disk slideshow image cache (download_dir/.img_cache), keyed by a hash of the image URL
+_IMAGE_CACHE_TTL = 3 * 86400  # entries unused for this long are swept
+_IMAGE_CACHE_SWEEP_EVERY = 3600
+_CACHED_IMAGE_EXTS = tuple(dict.fromkeys(_EXT_BY_SUFFIX.values()))
+
+# MP4 sample-entry FourCC -> ffprobe codec name, for the header sniff in _ensure_mp4_h264
+_MP4_VIDEO_FOURCCS = {
+    b'avc1': 'h264', b'avc3': 'h264',
+    b'hvc1': 'hevc', b'hev1': 'hevc',
+    b'av01': 'av1', b'vp09': 'vp9',
+}
+_MOOV_SNIFF_MAX = 16 * 1024 * 1024
+# yt-dlp vcodec string prefix -> ffprobe codec name ('avc1.64001F' -> 'h264')
+_YTDLP_VCODEC_PREFIXES = (
+    ('avc', 'h264'), ('h264', 'h264'),
+    ('hvc1', 'hevc'), ('hev1', 'hevc'), ('h265', 'hevc'), ('hevc', 'hevc'),
+    ('vp09', 'vp9'), ('vp9', 'vp9'), ('av01', 'av1'),
+)
+
+# ffmpeg prints per-frame stats to stderr; keep it to real errors so there's nothing to buffer
+_FFMPEG_QUIET = ('-hide_banner', '-nostats', '-loglevel', 'error')
+_SHORT_HOSTS = frozenset(('vm.tiktok.com', 'vt.tiktok.com', 'v.douyin.com'))
+_PROFILE_AT_RE = re.compile(r'^/@[^/]+$')
+_DOUYIN_USER_RE = re.compile(r'^/user/[^/]+$')
+_SANITIZE_BAD_RE = re.compile(r'[<>:"/\\|?*]')
+_SANITIZE_WS_RE = re.compile(r'\s+')
+_SHARE_URL_RE = re.compile(
+    r'https?://(?:(?:www\.|v\.|vm\.)?(?:tiktok\.com|douyin\.com)|vt\.tiktok\.com)/[^\s\u4e00-\u9fff\uff00-\uffef]*',
+    re.IGNORECASE,
+)
+_TRAILING_PUNCT_RE = re.compile(r'[,;!?）)》」』\]]+$')
+_DOUYIN_ID_PATH_RE = re.compile(r'/(video|note)/(\d+)')
+_DOUYIN_MODAL_ID_RE = re.compile(r'modal_id=(\d+)')
+
+# Inputs starting with these (and free of whitespace/CJK) are already clean URLs
+_CANONICAL_URL_PREFIXES = (
+    'https://www.tiktok.com/', 'https://vm.tiktok.com/', 'https://vt.tiktok.com/',
+    'https://www.douyin.com/', 'https://v.douyin.com/', 'https://m.douyin.com/',
+)
+
+# Per-thread YoutubeDL reused for metadata-only extraction (see _shared_info_ydl)
+_ydl_local = threading.local()
+
+# Windows process-name snapshot for _is_browser_running: (lowercased image names, taken_at)
+_proc_snapshot: Optional[Tuple[Set[str], float]] = None
+_PROC_TTL = 5.0
 
 
 class TikTokService:
@@ -26,8 +136,10 @@ class TikTokService:
         self.ffmpeg_dir = None
         if settings.FFMPEG_PATH and os.path.isdir(settings.FFMPEG_PATH):
             self.ffmpeg_dir = settings.FFMPEG_PATH
-        elif shutil.which('ffmpeg'):
-            self.ffmpeg_dir = os.path.dirname(shutil.which('ffmpeg'))
+        else:
+            found = shutil.which('ffmpeg')
+            if found:
+                self.ffmpeg_dir = os.path.dirname(found)
 
         if not self.ffmpeg_dir:
             logger.warning(
@@ -35,14 +147,51 @@ class TikTokService:
                 "Set FFMPEG_PATH in .env or install ffmpeg to your system PATH."
             )
 
+        # Resolve the ffmpeg/ffprobe executables once rather than probing the filesystem per call
+        self._ffmpeg_bin = self._resolve_ff_binary('ffmpeg')
+        self._ffprobe_bin = self._resolve_ff_binary('ffprobe')
+
+        # Optional hardware encoder for H.264 re-encodes (settings.HWACCEL), probed once
+        self._hw_encoder = pick_hw_encoder(self._ffmpeg_bin, settings.HWACCEL)
+
+        # Shared keep-alive pool for page, video and image fetches (CDN hosts repeat a lot)
+        self._http = urllib3.PoolManager(num_pools=10, maxsize=_SLIDESHOW_CONCURRENCY)
+
+        # Slideshow images are reused across repeat downloads of the same post
+        self._image_cache_dir = os.path.join(self.download_dir, '.img_cache')
+        os.makedirs(self._image_cache_dir, exist_ok=True)
+        self._image_cache_swept = 0.0
+
+    def _resolve_ff_binary(self, name: str) -> str:
+        """Return the path to an FFmpeg tool inside ffmpeg_dir, or the bare name to use PATH."""
+        if self.ffmpeg_dir:
+            candidate = os.path.join(self.ffmpeg_dir, name)
+            if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
+                return candidate
+        return name
+
     @staticmethod
-    def _is_douyin_url(url: str) -> bool:
-        """Check if a URL is a Douyin (Chinese TikTok) URL."""
+    @functools.lru_cache(maxsize=4096)
+    def _classify_url(url: str) -> Tuple[str, str]:
+        """Return (hostname, lowercased path without trailing '/') for a URL; ('', '') if unparseable.
+
+        Memoised — urlparse is regex-heavy and batch jobs see the same links repeatedly.
+        """
         try:
-            host = urlparse(url).hostname or ''
-            return 'douyin.com' in host
+            parsed = urlparse(url)
+            return parsed.hostname or '', parsed.path.lower().rstrip('/')
         except Exception:
-            return False
+            return '', ''
+
+    @staticmethod
+    def _parsed_host(url: str) -> str:
+        """Return the hostname of a URL ('' if unparseable)."""
+        return TikTokService._classify_url(url)[0]
+
+    @staticmethod
+    def _is_douyin_url(url: str) -> bool:
+        """Check if a URL is a Douyin (Chinese TikTok) URL."""
+        return 'douyin.com' in TikTokService._parsed_host(url)
 
     @staticmethod
     def _is_browser_running(browser: str) -> bool:
@@ -68,14 +217,23 @@ class TikTokService:
         proc_name = process_map.get(browser)
         if not proc_name:
             return False
-        try:
-            result = subprocess.run(
-                ['tasklist', '/FI', f'IMAGENAME eq {proc_name}', '/NH'],
-                capture_output=True, text=True, timeout=5,
-            )
-            return proc_name.lower() in result.stdout.lower()
-        except Exception:
-            return False
+
+        # One tasklist call per burst: cookie fallbacks probe several browsers in a row
+        global _proc_snapshot
+        if _proc_snapshot is None or time.time() - _proc_snapshot[1] >= _PROC_TTL:
+            try:
+                result = subprocess.run(
+                    ['tasklist', '/FO', 'CSV', '/NH'],
+                    capture_output=True, text=True, timeout=5,
+                )
+            except Exception:
+                return False
+            names = {
+                line.split(',', 1)[0].strip('"').lower()
+                for line in result.stdout.splitlines() if line
+            }
+            _proc_snapshot = (names, time.time())
+        return proc_name in _proc_snapshot[0]
 
     @staticmethod
     def _cookie_string_to_file(cookie_string: str) -> Optional[str]:
@@ -84,21 +242,19 @@ class TikTokService:
         Returns the temp file path (caller must delete it), or None if parsing fails.
         """
         import tempfile
-        pairs = []
-        for part in cookie_string.split(';'):
-            part = part.strip()
-            if '=' not in part:
-                continue
-            name, _, value = part.partition('=')
-            pairs.append((name.strip(), value.strip()))
+        pairs = [
+            (name.strip(), value.strip())
+            for name, sep, value in (part.partition('=') for part in cookie_string.split(';'))
+            if sep and name.strip()
+        ]
         if not pairs:
             return None
+        lines = ['# Netscape HTTP Cookie File\n']
+        lines.extend(f'.douyin.com\tTRUE\t/\tFALSE\t0\t{name}\t{value}\n' for name, value in pairs)
         fd, path = tempfile.mkstemp(suffix='.txt', prefix='douyin_cookies_')
         try:
             with os.fdopen(fd, 'w') as f:
-                f.write('# Netscape HTTP Cookie File\n')
-                for name, value in pairs:
-                    f.write(f'.douyin.com\tTRUE\t/\tFALSE\t0\t{name}\t{value}\n')
+                f.write(''.join(lines))
             return path
         except Exception as e:
             logger.warning("Failed to write temp cookie file: %s", e)
@@ -122,22 +278,28 @@ class TikTokService:
         'Version/16.0 Mobile/15E148 Safari/604.1'
     )
 
+    @staticmethod
+    def _follow_redirects(url: str) -> str:
+        """Return the final URL after redirects, cached for _REDIRECT_CACHE_TTL. Failures raise and aren't cached."""
+        final = _redirect_cache.get(url)
+        if final is not None:
+            return final
+        import http.cookiejar
+        cj = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(cj),
+        )
+        req = urllib.request.Request(url, headers={'User-Agent': TikTokService._DOUYIN_UA})
+        resp = opener.open(req, timeout=10)
+        _redirect_cache[url] = resp.url
+        return resp.url
+
     def _resolve_short_url(self, url: str) -> str:
         """Follow redirects for short URLs (v.douyin.com, vt.tiktok.com, vm.tiktok.com) and return the final URL."""
-        import http.cookiejar
-        parsed = urlparse(url)
-        host = parsed.hostname or ''
-        short_hosts = ('v.douyin.com', 'vt.tiktok.com', 'vm.tiktok.com')
-        if not any(h in host for h in short_hosts):
+        if self._parsed_host(url) not in _SHORT_HOSTS:
             return url
         try:
-            cj = http.cookiejar.CookieJar()
-            opener = urllib.request.build_opener(
-                urllib.request.HTTPCookieProcessor(cj),
-            )
-            req = urllib.request.Request(url, headers={'User-Agent': self._DOUYIN_UA})
-            resp = opener.open(req, timeout=10)
-            final = resp.url
+            final = self._follow_redirects(url)
             logger.info("Resolved short URL %s -> %s", url, final)
             return final
         except Exception as e:
@@ -151,14 +313,32 @@ class TikTokService:
     @staticmethod
     def _extract_douyin_video_id(url: str) -> Optional[str]:
         """Extract the aweme/video ID from a Douyin URL."""
-        m = re.search(r'/(video|note)/(\d+)', url)
+        m = _DOUYIN_ID_PATH_RE.search(url)
         if m:
             return m.group(2)
-        m = re.search(r'modal_id=(\d+)', url)
+        m = _DOUYIN_MODAL_ID_RE.search(url)
         if m:
             return m.group(1)
         return None
 
+    @staticmethod
+    def _iter_script_texts(html: str):
+        """Yield the text of every <script> tag in the page.
+
+        Uses selectolax's single-pass C parser when installed; falls back to a
+        DOTALL regex scan if it is missing or the parse fails.
+        """
+        if HTMLParser is not None:
+            try:
+                nodes = HTMLParser(html).css('script')
+            except Exception as e:
+                logger.warning("selectolax parse failed, using regex fallback: %s", e)
+            else:
+                for node in nodes:
+                    yield node.text() or ''
+                return
+        yield from re.findall(r'<script[^>]*>(.*?)</script>', html, re.DOTALL)
+
     def _get_douyin_info_direct(self, url: str) -> Optional[Dict]:
         """Scrape Douyin mobile share page for video info — no yt-dlp, no login needed.
 
@@ -177,13 +357,13 @@ class TikTokService:
         # 2. Fetch the mobile share page (no anti-bot blocking)
         page_url = f'https://m.douyin.com/share/video/{video_id}'
         try:
-            req = urllib.request.Request(page_url, headers={
+            headers = {
                 'User-Agent': self._DOUYIN_MOBILE_UA,
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
                 'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
                 'Referer': 'https://m.douyin.com/',
-            })
-            with urllib.request.urlopen(req, timeout=15) as resp:
+            }
+            with self._http_get(page_url, headers, timeout=15) as resp:
                 html = resp.read().decode('utf-8', errors='replace')
         except Exception as e:
             logger.warning("Failed to fetch Douyin mobile page %s: %s", page_url, e)
@@ -193,15 +373,14 @@ class TikTokService:
 
         # 3. Extract item_list from embedded script data
         item = None
-        scripts = re.findall(r'<script[^>]*>(.*?)</script>', html, re.DOTALL)
-        for s in scripts:
+        for s in self._iter_script_texts(html):
             if 'play_addr' not in s and 'playAddr' not in s:
                 continue
             # Try snake_case format (item_list / status_code)
             m = re.search(r'"item_list"\s*:\s*\[(.*?)\]\s*,\s*"status_code"', s, re.DOTALL)
             if m:
                 try:
-                    items = _json.loads('[' + m.group(1) + ']')
+                    items = _json_loads('[' + m.group(1) + ']')
                     if items:
                         item = items[0]
                         break
@@ -211,7 +390,7 @@ class TikTokService:
             m = re.search(r'"itemList"\s*:\s*\[(.*?)\]\s*,\s*"statusCode"', s, re.DOTALL)
             if m:
                 try:
-                    items = _json.loads('[' + m.group(1) + ']')
+                    items = _json_loads('[' + m.group(1) + ']')
                     if items:
                         item = items[0]
                         break
@@ -299,28 +478,168 @@ class TikTokService:
         progress_callback: Optional[callable] = None,
     ) -> str:
         """Download a file from a direct URL with progress reporting."""
-        req = urllib.request.Request(url, headers={
+        headers = {
             'User-Agent': self._DOUYIN_MOBILE_UA,
             'Referer': 'https://m.douyin.com/',
-        })
-        with urllib.request.urlopen(req, timeout=300) as resp:
+        }
+        report = self._throttled_progress(progress_callback) if progress_callback else None
+        with self._http_get(url, headers, timeout=300) as resp:
             total = int(resp.headers.get('Content-Length', 0))
             downloaded = 0
             with open(file_path, 'wb') as f:
                 while True:
-                    chunk = resp.read(65536)
+                    chunk = resp.read(_COPY_CHUNK)
                     if not chunk:
                         break
                     f.write(chunk)
                     downloaded += len(chunk)
-                    if progress_callback and total:
-                        progress_callback({
+                    if report and total:
+                        report({
                             'status': 'downloading',
                             'total_bytes': total,
                             'downloaded_bytes': downloaded,
-                        })
+                        }, final=downloaded >= total)
         return file_path
 
+    @contextlib.contextmanager
+    def _http_get(self, url: str, headers: dict, timeout: float):
+        """GET over the shared connection pool. Raises on HTTP errors, like urlopen."""
+        resp = self._http.request('GET', url, headers=headers, timeout=timeout, preload_content=False)
+        try:
+            if resp.status >= 400:
+                raise Exception(f"HTTP Error {resp.status}: {resp.reason}")
+            yield resp
+        except BaseException:
+            resp.close()  # never hand a half-read connection back to the pool
+            raise
+        finally:
+            resp.release_conn()
+
+    @staticmethod
+    def _image_ext(img_url: str, content_type: str) -> str:
+        """Pick a slideshow image extension: Content-Type first, then the URL path suffix, else .webp."""
+        ext = _EXT_BY_CT.get(content_type.partition(';')[0].strip().lower())
+        if ext:
+            return ext
+        suffix = img_url.partition('?')[0].partition('#')[0].rpartition('.')[2].lower()
+        return _EXT_BY_SUFFIX.get(suffix, '.webp')
+
+    @staticmethod
+    def _check_image_size(content_length: Optional[str], received: int = 0):
+        """Raise if an image's declared or received size passes _MAX_IMAGE_BYTES."""
+        if content_length and content_length.isdigit() and int(content_length) > _MAX_IMAGE_BYTES:
+            raise Exception(f"Image too large ({content_length} bytes)")
+        if received > _MAX_IMAGE_BYTES:
+            raise Exception(f"Image exceeded {_MAX_IMAGE_BYTES} bytes")
+
+    @staticmethod
+    def _save_image_response(resp, file_path: str) -> int:
+        """Stream an image response to disk in 256 KiB chunks (unbuffered — chunks are already large).
+
+        Gives up past _MAX_IMAGE_BYTES, whether announced by Content-Length or
+        not. Returns the number of bytes written, so callers needn't stat the file.
+        """
+        TikTokService._check_image_size(resp.headers.get('Content-Length'))
+        written = 0
+        with open(file_path, 'wb', buffering=0) as f:
+            while chunk := resp.read(_COPY_CHUNK):
+                written += f.write(chunk)
+                TikTokService._check_image_size(None, written)
+        return written
+
+    # ---- Slideshow image cache ----
+
+    def _image_cache_base(self, img_url: str) -> str:
+        """Cache path (without extension) for an image URL.
+
+        The signed query string changes whenever the post info is refreshed, so
+        only the URL path — which names the image itself — goes into the key.
+        """
+        key = hashlib.sha256(img_url.partition('?')[0].encode()).hexdigest()
+        return os.path.join(self._image_cache_dir, key)
+
+    def _cached_image(self, img_url: str) -> Optional[Tuple[str, str]]:
+        """Return (cache_path, ext) if this image is already cached, else None."""
+        base = self._image_cache_base(img_url)
+        for ext in _CACHED_IMAGE_EXTS:
+            path = base + ext
+            try:
+                os.utime(path)  # a hit keeps the entry alive for another TTL
+                return path, ext
+            except OSError:
+                continue
+        return None
+
+    def _ensure_cached_image(self, img_url: str) -> Tuple[str, str]:
+        """Return (cache_path, ext) for an image, downloading it into the cache on a miss."""
+        hit = self._cached_image(img_url)
+        if hit is not None:
+            return hit
+        base = self._image_cache_base(img_url)
+        tmp_path = f'{base}.{uuid.uuid4().hex}.tmp'
+        try:
+            with self._http_get(img_url, _IMAGE_HEADERS, timeout=30) as resp:
+                ext = self._image_ext(img_url, resp.headers.get('Content-Type', ''))
+                self._save_image_response(resp, tmp_path)
+            # Only complete transfers are published, so readers never see a truncated image
+            os.replace(tmp_path, base + ext)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return base + ext, ext
+
+    async def _ensure_cached_image_async(self, session, img_url: str) -> Tuple[str, str]:
+        """aiohttp counterpart of _ensure_cached_image."""
+        hit = self._cached_image(img_url)
+        if hit is not None:
+            return hit
+        base = self._image_cache_base(img_url)
+        tmp_path = f'{base}.{uuid.uuid4().hex}.tmp'
+        try:
+            async with session.get(img_url) as resp:
+                resp.raise_for_status()
+                ext = self._image_ext(img_url, resp.headers.get('Content-Type', ''))
+                self._check_image_size(resp.headers.get('Content-Length'))
+                written = 0
+                with open(tmp_path, 'wb', buffering=0) as f:
+                    async for chunk in resp.content.iter_chunked(_COPY_CHUNK):
+                        written += f.write(chunk)
+                        self._check_image_size(None, written)
+            os.replace(tmp_path, base + ext)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return base + ext, ext
+
+    @staticmethod
+    def _link_or_copy(src: str, dst: str) -> int:
+        """Hard-link a cached image into place (copy across filesystems); returns its size."""
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+        return os.path.getsize(dst)
+
+    def _sweep_image_cache(self):
+        """Drop cache entries unused for _IMAGE_CACHE_TTL; runs at most once an hour."""
+        now = time.time()
+        if now - self._image_cache_swept < _IMAGE_CACHE_SWEEP_EVERY:
+            return
+        self._image_cache_swept = now
+        cutoff = now - _IMAGE_CACHE_TTL
+        try:
+            with os.scandir(self._image_cache_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning("Failed to sweep slideshow image cache: %s", e)
+
     # ---- Cookie opts (for TikTok URLs — yt-dlp path) ----
 
     def _get_cookie_opts(self, url: str, user_cookie: Optional[str] = None) -> dict:
@@ -358,106 +677,177 @@ class TikTokService:
     @staticmethod
     def _extract_url_from_text(text: str) -> str:
         """Extract a TikTok or Douyin URL from share text (may contain Chinese, hashtags, etc.)."""
-        match = re.search(
-            r'https?://(?:(?:www\.|v\.|vm\.)?(?:tiktok\.com|douyin\.com)|vt\.tiktok\.com)/[^\s\u4e00-\u9fff\uff00-\uffef]*',
-            text, re.IGNORECASE,
-        )
+        # Fast path: a bare canonical URL (the usual API input) needs no regex
+        stripped = text.strip()
+        if (stripped.startswith(_CANONICAL_URL_PREFIXES)
+                and not any(c.isspace() for c in stripped)
+                and max(stripped) < '\u4e00'
+                and stripped[-1] not in ',;!?)]'):
+            return stripped
+        match = _SHARE_URL_RE.search(text)
         if match:
-            return re.sub(r'[,;!?）)》」』\]]+$', '', match.group(0))
+            return _TRAILING_PUNCT_RE.sub('', match.group(0))
         return text.strip()
 
     @staticmethod
     def _normalize_tiktok_url(url: str) -> str:
         """Rewrite /photo/ and /note/ URLs to /video/ so yt-dlp can process them."""
-        url = re.sub(r'/photo/', '/video/', url)
-        url = re.sub(r'/note/', '/video/', url)
-        return url
+        if '/photo/' not in url and '/note/' not in url:
+            return url
+        return url.replace('/photo/', '/video/').replace('/note/', '/video/')
+
+    def _prepare_url(self, url: str) -> str:
+        """Extract, resolve and normalize a user-supplied URL in one step.
+
+        Results are cached per input for _REDIRECT_CACHE_TTL, so a link that is
+        previewed and then downloaded skips the extraction, the redirect round
+        trip and the rewrites. A short link that failed to resolve isn't cached.
+        """
+        prepared = _prepared_url_cache.get(url)
+        if prepared is not None:
+            return prepared
+        resolved = self._resolve_short_url(self._extract_url_from_text(url))
+        if self._is_douyin_url(resolved):
+            prepared = resolved  # normalization only rewrites TikTok paths
+        else:
+            prepared = self._normalize_tiktok_url(resolved)
+        if self._parsed_host(prepared) not in _SHORT_HOSTS:
+            _prepared_url_cache[url] = prepared
+        return prepared
 
     def get_video_info(self, url: str, user_cookie: Optional[str] = None) -> Dict:
-        url = self._extract_url_from_text(url)
-        # Resolve short URLs (vt.tiktok.com, vm.tiktok.com, v.douyin.com) first
-        url = self._resolve_short_url(url)
+        return self._get_info_prepared(self._prepare_url(url), user_cookie)
 
+    def _info_ydl_opts(self) -> dict:
+        opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': False,
+        }
+        if self.ffmpeg_dir:
+            opts['ffmpeg_location'] = self.ffmpeg_dir
+        return opts
+
+    def _shared_info_ydl(self) -> yt_dlp.YoutubeDL:
+        """Return this thread's metadata-only YoutubeDL, creating it on first use.
+
+        Building a YoutubeDL (extractor registry, opener, cookie jar) costs tens
+        of ms; info lookups run on reused worker threads, so one instance per
+        thread avoids that without sharing a YoutubeDL across threads.
+        """
+        ydl = getattr(_ydl_local, 'info', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self._info_ydl_opts())
+            _ydl_local.info = ydl
+        return ydl
+
+    def _get_info_prepared(self, url: str, user_cookie: Optional[str] = None) -> Dict:
+        """get_video_info for a URL that has already been through _prepare_url.
+
+        Concurrent misses for the same URL are collapsed: the first caller
+        extracts, the rest wait for it and read the cache.
+        """
         cached = _info_cache.get(url)
-        if cached and time.time() - cached["_ts"] < _INFO_CACHE_TTL:
-            return cached["data"]
+        if cached is not None:
+            return cached
+
+        with _info_inflight_lock:
+            event = _info_inflight.get(url)
+            leader = event is None
+            if leader:
+                event = _info_inflight[url] = threading.Event()
+        if not leader:
+            event.wait(_INFO_INFLIGHT_WAIT)
+            cached = _info_cache.get(url)
+            if cached is not None:
+                return cached
+            # The leader failed or is stuck — try on our own
+
+        try:
+            return self._fetch_info_prepared(url, user_cookie)
+        finally:
+            if leader:
+                with _info_inflight_lock:
+                    del _info_inflight[url]
+                event.set()
 
+    def _fetch_info_prepared(self, url: str, user_cookie: Optional[str] = None) -> Dict:
+        """Uncached metadata lookup for a prepared URL; stores the result in _info_cache."""
         # For Douyin URLs → use direct scraper (bypasses yt-dlp cookie issues)
         if self._is_douyin_url(url):
             direct = self._get_douyin_info_direct(url)
             if direct:
-                _info_cache[url] = {"data": direct, "_ts": time.time()}
+                _info_cache[url] = direct
                 return direct
             raise Exception(
                 "Failed to fetch Douyin video info. The video may be private or the URL is invalid."
             )
 
-        norm_url = self._normalize_tiktok_url(url)
-
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-        }
-        if self.ffmpeg_dir:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
-        cookie_opts = self._get_cookie_opts(norm_url, user_cookie)
-        ydl_opts.update(cookie_opts)
+        cookie_opts = self._get_cookie_opts(url, user_cookie)
+        if cookie_opts:
+            ydl_ctx = yt_dlp.YoutubeDL({**self._info_ydl_opts(), **cookie_opts})
+        else:
+            # No per-call options — reuse this thread's long-lived instance
+            ydl_ctx = contextlib.nullcontext(self._shared_info_ydl())
 
         try:
-         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(norm_url, download=False)
-
-            # Detect slideshow: yt-dlp returns vcodec=none (audio only) for photo posts
-            is_slideshow = False
-            image_urls = []
-            raw_data = None
-            has_video = info.get('vcodec') not in (None, 'none')
-            if not has_video:
-                # No video stream — likely a slideshow; use TikTokIE for raw image data
-                try:
-                    ie = TikTokIE(ydl)
-                    video_id = info.get('id') or norm_url.rstrip('/').split('/')[-1]
-                    raw_data, _ = ie._extract_web_data_and_status(norm_url, video_id)
-                    if raw_data and 'imagePost' in raw_data:
-                        images = raw_data['imagePost'].get('images', [])
-                        image_urls = [
-                            img['imageURL']['urlList'][0]
-                            for img in images
-                            if img.get('imageURL', {}).get('urlList')
-                        ]
-                        is_slideshow = len(image_urls) > 0
-                except Exception as e:
-                    logger.warning("Failed to extract raw TikTok data for slideshow detection: %s", e)
-
-            # For slideshows, extract tags from raw data (yt-dlp doesn't include them)
-            tags = info.get('tags') or []
-            if is_slideshow and not tags and raw_data:
-                challenges = raw_data.get('challenges') or []
-                tags = [c['title'] for c in challenges if c.get('title')]
-
-            title_fallback = 'TikTok Slideshow' if is_slideshow else 'TikTok Video'
-            result = {
-                'video_id': info.get('id'),
-                'title': info.get('title') or (info.get('description') or '')[:80] or title_fallback,
-                'duration': info.get('duration'),
-                'thumbnail': info.get('thumbnail'),
-                'uploader': info.get('uploader') or info.get('creator'),
-                'upload_date': info.get('upload_date'),
-                'description': info.get('description'),
-                'view_count': info.get('view_count'),
-                'like_count': info.get('like_count'),
-                'tags': tags,
-                'is_slideshow': is_slideshow,
-                'image_count': len(image_urls) if is_slideshow else 0,
-                'image_urls': image_urls if is_slideshow else [],
-            }
-
-            _info_cache[url] = {"data": result, "_ts": time.time()}
-            return result
+            with ydl_ctx as ydl:
+                return self._extract_info_with(ydl, url)
         finally:
             self._cleanup_cookie_opts(cookie_opts)
 
+    def _extract_info_with(self, ydl: yt_dlp.YoutubeDL, url: str) -> Dict:
+        """Run yt-dlp metadata extraction for one prepared TikTok URL and cache it."""
+        info = ydl.extract_info(url, download=False)
+
+        # Detect slideshow: yt-dlp returns vcodec=none (audio only) for photo posts
+        is_slideshow = False
+        image_urls = []
+        raw_data = None
+        has_video = info.get('vcodec') not in (None, 'none')
+        if not has_video:
+            # No video stream — likely a slideshow; use TikTokIE for raw image data
+            try:
+                ie = TikTokIE(ydl)
+                video_id = info.get('id') or url.rstrip('/').split('/')[-1]
+                raw_data, _ = ie._extract_web_data_and_status(url, video_id)
+                if raw_data and 'imagePost' in raw_data:
+                    images = raw_data['imagePost'].get('images', [])
+                    image_urls = [
+                        img['imageURL']['urlList'][0]
+                        for img in images
+                        if img.get('imageURL', {}).get('urlList')
+                    ]
+                    is_slideshow = len(image_urls) > 0
+            except Exception as e:
+                logger.warning("Failed to extract raw TikTok data for slideshow detection: %s", e)
+
+        # For slideshows, extract tags from raw data (yt-dlp doesn't include them)
+        tags = info.get('tags') or []
+        if is_slideshow and not tags and raw_data:
+            challenges = raw_data.get('challenges') or []
+            tags = [c['title'] for c in challenges if c.get('title')]
+
+        title_fallback = 'TikTok Slideshow' if is_slideshow else 'TikTok Video'
+        result = {
+            'video_id': info.get('id'),
+            'title': info.get('title') or (info.get('description') or '')[:80] or title_fallback,
+            'duration': info.get('duration'),
+            'thumbnail': info.get('thumbnail'),
+            'uploader': info.get('uploader') or info.get('creator'),
+            'upload_date': info.get('upload_date'),
+            'description': info.get('description'),
+            'view_count': info.get('view_count'),
+            'like_count': info.get('like_count'),
+            'tags': tags,
+            'is_slideshow': is_slideshow,
+            'image_count': len(image_urls) if is_slideshow else 0,
+            'image_urls': image_urls if is_slideshow else [],
+        }
+
+        _info_cache[url] = result
+        return result
+
     def download_video(
         self,
         url: str,
@@ -466,14 +856,14 @@ class TikTokService:
         download_dir: Optional[str] = None,
         user_cookie: Optional[str] = None,
     ) -> Dict:
-        url = self._normalize_tiktok_url(self._resolve_short_url(self._extract_url_from_text(url)))
+        url = self._prepare_url(url)
         download_id = str(uuid.uuid4())
         target_dir = download_dir or self.download_dir
         os.makedirs(target_dir, exist_ok=True)
 
         # ---- Douyin direct download path ----
         if self._is_douyin_url(url):
-            info = self.get_video_info(url, user_cookie=user_cookie)
+            info = self._get_info_prepared(url, user_cookie=user_cookie)
             direct_url = info.get('_direct_video_url')
             if not direct_url:
                 raise Exception("Could not get Douyin video download URL.")
@@ -481,12 +871,16 @@ class TikTokService:
             file_path = os.path.join(target_dir, f'{download_id}.mp4')
             self._download_file_direct(direct_url, file_path, progress_callback)
 
-            if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            # One stat covers the empty-file check and the reported size (rename keeps it)
+            try:
+                file_size = os.stat(file_path).st_size
+            except OSError:
+                file_size = 0
+            if not file_size:
                 raise Exception("Douyin download failed — empty file.")
 
             title = info.get('title', 'Douyin Video')
             file_path = self._rename_to_title(file_path, title)
-            file_size = os.path.getsize(file_path)
 
             return {
                 'download_id': download_id,
@@ -505,6 +899,8 @@ class TikTokService:
         ydl_opts = {
             'format': 'bestvideo[vcodec^=avc]+bestaudio/bestvideo*+bestaudio/best',
             'merge_output_format': 'mp4',
+            # Merger already stream-copies; also move moov up front so the file streams as-is
+            'postprocessor_args': {'merger': ['-movflags', '+faststart']},
             'outtmpl': output_template,
             'quiet': True,
             'no_warnings': True,
@@ -522,24 +918,34 @@ class TikTokService:
          with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
 
-            downloaded_file = self._find_output_file(target_dir, download_id, 'mp4')
+            # One directory scan serves both the output lookup and the fallback merge
+            entries = scan_download_files(target_dir, download_id)
+            downloaded_file = self._find_output_file(target_dir, download_id, 'mp4', entries)
             if not downloaded_file:
                 raise Exception("Download completed but output file not found.")
 
-            # Verify the merged file has both video and audio streams
-            streams = self._verify_merged_streams(downloaded_file)
+            # Verify the merged file has both video and audio streams. A final
+            # {id}.mp4 only exists once yt-dlp's merge succeeded, so its own format
+            # info can vouch for the streams; ffprobe runs only when it can't.
+            streams = None
+            if os.path.basename(downloaded_file) == f'{download_id}.mp4':
+                streams = self._streams_from_info(info)
+            if streams is None:
+                streams = self._verify_merged_streams(downloaded_file)
+            video_codec = streams['video_codec']  # reused by _ensure_mp4_h264 while the file is unchanged
             if not streams['has_video'] or not streams['has_audio']:
                 logger.warning(
                     "Merged file missing streams (video=%s, audio=%s). Attempting fallback merge.",
                     streams['has_video'], streams['has_audio']
                 )
-                fallback = self._merge_streams_fallback(target_dir, download_id)
+                fallback = self._merge_streams_fallback(target_dir, download_id, entries)
                 if fallback:
                     downloaded_file = fallback
+                    video_codec = None
                 else:
                     logger.error("Fallback merge failed — serving file as-is")
 
-            downloaded_file = self._ensure_mp4_h264(downloaded_file)
+            downloaded_file = self._ensure_mp4_h264(downloaded_file, video_codec)
 
             # Clean up leftover intermediate stream files
             self._cleanup_intermediate_files(target_dir, download_id, downloaded_file)
@@ -569,14 +975,14 @@ class TikTokService:
         progress_callback: Optional[callable] = None,
         user_cookie: Optional[str] = None,
     ) -> Dict:
-        url = self._normalize_tiktok_url(self._resolve_short_url(self._extract_url_from_text(url)))
+        url = self._prepare_url(url)
         download_id = str(uuid.uuid4())
         target_dir = download_dir or self.download_dir
         os.makedirs(target_dir, exist_ok=True)
 
         # ---- Douyin direct path: download video then extract audio with ffmpeg ----
         if self._is_douyin_url(url):
-            info = self.get_video_info(url, user_cookie=user_cookie)
+            info = self._get_info_prepared(url, user_cookie=user_cookie)
             direct_url = info.get('_direct_video_url')
             if not direct_url:
                 raise Exception("Could not get Douyin video URL for audio extraction.")
@@ -585,30 +991,8 @@ class TikTokService:
             temp_video = os.path.join(target_dir, f'{download_id}_temp.mp4')
             self._download_file_direct(direct_url, temp_video, progress_callback)
 
-            # Extract audio with ffmpeg
-            import subprocess
             audio_file = os.path.join(target_dir, f'{download_id}.{format}')
-            ffmpeg_bin = 'ffmpeg'
-            if self.ffmpeg_dir:
-                candidate = os.path.join(self.ffmpeg_dir, 'ffmpeg')
-                if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
-                    ffmpeg_bin = candidate
-
-            try:
-                subprocess.run(
-                    [ffmpeg_bin, '-i', temp_video, '-vn', '-acodec',
-                     'libmp3lame' if format == 'mp3' else 'aac',
-                     '-b:a', '192k', '-y', audio_file],
-                    capture_output=True, timeout=300,
-                )
-            finally:
-                try:
-                    os.remove(temp_video)
-                except OSError:
-                    pass
-
-            if not os.path.exists(audio_file) or os.path.getsize(audio_file) == 0:
-                raise Exception("Audio extraction failed. FFmpeg is required.")
+            self._extract_audio(temp_video, audio_file, format)
 
             title = info.get('title', 'Douyin Audio')
             audio_file = self._rename_to_title(audio_file, title)
@@ -676,119 +1060,192 @@ class TikTokService:
         finally:
             self._cleanup_cookie_opts(cookie_opts)
 
+    def _extract_audio(self, source: str, audio_file: str, format: str):
+        """Convert `source` to `audio_file` with ffmpeg and remove the source."""
+        import subprocess
+        try:
+            subprocess.run(
+                [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', source, '-vn', '-acodec',
+                 'libmp3lame' if format == 'mp3' else 'aac',
+                 '-b:a', '192k', '-y', audio_file],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=300,
+            )
+        finally:
+            try:
+                os.remove(source)
+            except OSError:
+                pass
+
+        if not os.path.exists(audio_file) or os.path.getsize(audio_file) == 0:
+            raise Exception("Audio extraction failed. FFmpeg is required.")
+
     def download_slideshow(
         self,
         url: str,
         download_dir: Optional[str] = None,
         progress_callback: Optional[callable] = None,
         user_cookie: Optional[str] = None,
+        info: Optional[Dict] = None,
     ) -> Dict:
-        url = self._normalize_tiktok_url(self._resolve_short_url(self._extract_url_from_text(url)))
+        """Download every image of a slideshow post into one ZIP archive.
+
+        Callers that already hold the post's info (e.g. from get_video_info)
+        can pass it as `info` to skip the lookup.
+        """
+        url = self._prepare_url(url)
         download_id = str(uuid.uuid4())
         target_dir = download_dir or self.download_dir
         os.makedirs(target_dir, exist_ok=True)
 
-        # Get info (uses cache)
-        info = self.get_video_info(url, user_cookie=user_cookie)
+        # Get info (uses cache) unless the caller already has it
+        if not info or not info.get('image_urls'):
+            info = self._get_info_prepared(url, user_cookie=user_cookie)
         image_urls = info.get('image_urls', [])
         if not image_urls:
             raise Exception("No images found in this slideshow post.")
 
         title = info.get('title') or 'TikTok Slideshow'
         total_images = len(image_urls)
+        self._sweep_image_cache()
         logger.info("Downloading slideshow: %d images, title=%s", total_images, title)
 
-        # Create temp directory for individual images
-        temp_dir = os.path.join(target_dir, f'_slideshow_{download_id}')
-        os.makedirs(temp_dir, exist_ok=True)
+        safe_title = self._sanitize_filename(title)
+        zip_path = unique_path(target_dir, f'{safe_title}_slideshow', '.zip')
 
-        downloaded_files = []
+        # Images land in the on-disk cache and are streamed from there into the archive
+        image_count = 0
+        report = self._throttled_progress(progress_callback) if progress_callback else None
         try:
-            for i, img_url in enumerate(image_urls):
-                # Check cancellation
+            # Own the file handle so the final size is just its offset after the ZIP closes
+            with open(zip_path, 'wb') as raw, zipfile.ZipFile(raw, 'w', zipfile.ZIP_STORED) as zf:
+                if aiohttp is not None:
+                    image_count = asyncio.run(self._zip_slideshow_async(image_urls, zf, report))
+                else:
+                    # No aiohttp: fetch on a small thread pool, write from this thread as images land
+                    with ThreadPoolExecutor(max_workers=min(_SLIDESHOW_CONCURRENCY, total_images)) as pool:
+                        futures = {pool.submit(self._ensure_cached_image, u): i for i, u in enumerate(image_urls)}
+                        try:
+                            for future in as_completed(futures):
+                                i = futures[future]
+                                try:
+                                    cache_path, ext = future.result()
+                                except Exception as e:
+                                    logger.warning("Failed to download image %d/%d: %s", i + 1, total_images, e)
+                                    continue
+                                image_count += 1
+                                self._write_slide(zf, i, total_images, ext, cache_path, image_count, report)
+                        except BaseException:
+                            pool.shutdown(wait=False, cancel_futures=True)
+                            raise
+
+                if not image_count:
+                    raise Exception("Failed to download any images from the slideshow.")
+
+                # Finalize ZIP
                 if progress_callback:
-                    progress_callback({
-                        "status": "downloading_image",
-                        "image_index": i,
-                        "image_total": total_images,
-                    })
-
-                # Determine extension from URL
-                ext = '.webp'
-                url_path = urlparse(img_url).path.lower()
-                for candidate in ('.jpg', '.jpeg', '.png', '.webp'):
-                    if candidate in url_path:
-                        ext = candidate
-                        break
+                    progress_callback({"status": "zipping"})
+                zf.close()  # writes the central directory
+                file_size = raw.tell()
+        except BaseException:
+            try:
+                os.remove(zip_path)
+            except OSError:
+                pass
+            raise
 
-                img_filename = f'slide_{i + 1:02d}{ext}'
-                img_path = os.path.join(temp_dir, img_filename)
+        logger.info("Created slideshow ZIP: %s (%d images, %d bytes)", zip_path, image_count, file_size)
 
-                try:
-                    req = urllib.request.Request(img_url, headers={
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                    })
-                    with urllib.request.urlopen(req, timeout=30) as resp:
-                        # Check content type for extension
-                        content_type = resp.headers.get('Content-Type', '')
-                        if 'jpeg' in content_type or 'jpg' in content_type:
-                            ext = '.jpg'
-                            img_filename = f'slide_{i + 1:02d}{ext}'
-                            img_path = os.path.join(temp_dir, img_filename)
-                        elif 'png' in content_type:
-                            ext = '.png'
-                            img_filename = f'slide_{i + 1:02d}{ext}'
-                            img_path = os.path.join(temp_dir, img_filename)
-
-                        with open(img_path, 'wb') as f:
-                            f.write(resp.read())
-
-                    downloaded_files.append(img_path)
-                    logger.info("Downloaded image %d/%d: %s", i + 1, total_images, img_filename)
-                except Exception as e:
-                    logger.warning("Failed to download image %d/%d: %s", i + 1, total_images, e)
-
-            if not downloaded_files:
-                raise Exception("Failed to download any images from the slideshow.")
-
-            # Create ZIP
-            if progress_callback:
-                progress_callback({"status": "zipping"})
+        return {
+            'download_id': download_id,
+            'video_id': info.get('video_id'),
+            'title': title,
+            'duration': info.get('duration'),
+            'file_path': zip_path,
+            'file_size': file_size,
+            'format': 'zip',
+            'image_count': image_count,
+        }
 
-            safe_title = self._sanitize_filename(title)
-            zip_filename = f'{safe_title}_slideshow.zip'
-            zip_path = os.path.join(target_dir, zip_filename)
+    async def _zip_slideshow_async(self, image_urls: list, zf: zipfile.ZipFile,
+                                   progress_callback: Optional[callable] = None) -> int:
+        """Download slideshow images concurrently while one writer appends them to `zf`.
 
-            # Handle duplicate filenames
-            if os.path.exists(zip_path):
-                counter = 1
-                while os.path.exists(zip_path):
-                    zip_path = os.path.join(target_dir, f'{safe_title}_slideshow ({counter}).zip')
-                    counter += 1
+        Fetchers hand finished images to the writer through a bounded queue, so
+        the archive fills as images arrive. Returns the number of images written.
+        """
+        total = len(image_urls)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_SLIDESHOW_CONCURRENCY)
 
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zf:
-                for img_path in downloaded_files:
-                    zf.write(img_path, os.path.basename(img_path))
+        async def fetch_one(session, i: int, img_url: str):
+            cache_path = ext = None
+            try:
+                cache_path, ext = await self._ensure_cached_image_async(session, img_url)
+            except Exception as e:
+                logger.warning("Failed to download image %d/%d: %s", i + 1, total, e)
+            # Failures are queued too so the writer knows when every image is accounted for
+            await queue.put((i, ext, cache_path))
+
+        async def write_all() -> int:
+            written = 0
+            for _ in range(total):
+                i, ext, cache_path = await queue.get()
+                if cache_path is None:
+                    continue
+                written += 1
+                self._write_slide(zf, i, total, ext, cache_path, written, progress_callback)
+            return written
+
+        connector = aiohttp.TCPConnector(limit=_SLIDESHOW_CONCURRENCY)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            headers=_IMAGE_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=30),
+        ) as session:
+            written, *_ = await asyncio.gather(
+                write_all(), *(fetch_one(session, i, u) for i, u in enumerate(image_urls)),
+            )
+        return written
 
-            file_size = os.path.getsize(zip_path)
-            logger.info("Created slideshow ZIP: %s (%d images, %d bytes)", zip_path, len(downloaded_files), file_size)
+    @staticmethod
+    def _throttled_progress(progress_callback: callable, interval: float = _PROGRESS_INTERVAL) -> callable:
+        """Wrap a callback so routine updates fire at most once per `interval` seconds.
 
-            return {
-                'download_id': download_id,
-                'video_id': info.get('video_id'),
-                'title': title,
-                'duration': info.get('duration'),
-                'file_path': zip_path,
-                'file_size': file_size,
-                'format': 'zip',
-                'image_count': len(downloaded_files),
-            }
-        finally:
-            # Clean up temp directory
-            try:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-            except Exception:
-                pass
+        The returned reporter takes `final=True` for an update that must always go
+        through (the last image or byte), so the client never stalls short of 100%.
+        """
+        last = 0.0
+
+        def report(d: dict, final: bool = False):
+            nonlocal last
+            now = time.monotonic()
+            if final or now - last >= interval:
+                last = now
+                progress_callback(d)
+
+        return report
+
+    @staticmethod
+    def _write_slide(zf: zipfile.ZipFile, i: int, total: int, ext: str, src_path: str,
+                     written: int, progress_callback: Optional[callable] = None):
+        """Stream one cached slideshow image into the archive and report it.
+
+        Copies in 1 MiB chunks, so memory stays flat however large the images are.
+        `progress_callback` is a _throttled_progress reporter.
+        """
+        img_filename = f'slide_{i + 1:02d}{ext}'
+        zinfo = zipfile.ZipInfo(img_filename, date_time=time.localtime()[:6])
+        zinfo.compress_type = zipfile.ZIP_STORED  # JPEG/PNG/WebP don't compress further
+        zinfo.file_size = os.path.getsize(src_path)  # lets zipfile pick ZIP64 only when needed
+        with open(src_path, 'rb') as src, zf.open(zinfo, 'w') as dst:
+            shutil.copyfileobj(src, dst, _ZIP_COPY_CHUNK)
+        logger.info("Downloaded image %d/%d: %s", i + 1, total, img_filename)
+        if progress_callback:
+            progress_callback({
+                "status": "image_complete",
+                "image_index": i,
+                "image_total": total,
+                "image_count": written,
+            }, final=written == total)
 
     def download_slideshow_images(
         self,
@@ -806,211 +1263,355 @@ class TikTokService:
 
         safe_title = self._sanitize_filename(title)
         total = len(image_urls)
-        results = []
+        self._sweep_image_cache()
+
+        if aiohttp is not None:
+            results = asyncio.run(self._download_slideshow_images_async(
+                image_urls, target_dir, safe_title, progress_callback,
+            ))
+        else:
+            # No aiohttp: fetch on a small thread pool; callbacks stay on this thread
+            by_index: Dict[int, Dict] = {}
+            with ThreadPoolExecutor(max_workers=min(_SLIDESHOW_CONCURRENCY, total)) as pool:
+                futures = {
+                    pool.submit(self._fetch_slideshow_image, i, total, u, target_dir, safe_title): i
+                    for i, u in enumerate(image_urls)
+                }
+                try:
+                    for future in as_completed(futures):
+                        result = future.result()
+                        if result is None:
+                            continue
+                        i = futures[future]
+                        by_index[i] = result
+                        if progress_callback:
+                            progress_callback({
+                                "status": "image_complete",
+                                "image_index": i,
+                                "image_total": total,
+                                "result": result,
+                            })
+                except BaseException:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+            results = [by_index[i] for i in sorted(by_index)]
 
-        for i, img_url in enumerate(image_urls):
+        if not results:
+            raise Exception("Failed to download any images.")
+
+        return {
+            'results': results,
+            'saved_count': len(results),
+            'total_count': total,
+        }
+
+    async def _download_slideshow_images_async(
+        self,
+        image_urls: list,
+        target_dir: str,
+        safe_title: str,
+        progress_callback: Optional[callable] = None,
+    ) -> List[Dict]:
+        """Fetch all slideshow images concurrently over one pooled aiohttp session.
+
+        Results keep the original image order; failed images are logged and skipped.
+        """
+        total = len(image_urls)
+        results: List[Optional[Dict]] = [None] * total
+
+        async def fetch_one(session, i: int, img_url: str):
             image_id = str(uuid.uuid4())
 
+            try:
+                # Fetch into the cache first, then link the user's copy from there
+                cache_path, ext = await self._ensure_cached_image_async(session, img_url)
+                file_path = os.path.join(target_dir, f"{image_id}{ext}")
+                file_size = self._link_or_copy(cache_path, file_path)
+
+                result = self._slideshow_image_result(i, total, image_id, file_path, file_size, ext, safe_title)
+            except Exception as e:
+                logger.warning("Failed to download slideshow image %d/%d: %s", i + 1, total, e)
+                return
+
+            results[i] = result
+            # Outside the try: a cancel raised by the callback must abort the whole batch
             if progress_callback:
                 progress_callback({
-                    "status": "downloading_image",
+                    "status": "image_complete",
                     "image_index": i,
                     "image_total": total,
+                    "result": result,
                 })
 
-            # Determine extension from URL first (fallback)
-            ext = '.webp'
-            url_path = urlparse(img_url).path.lower()
-            for candidate in ('.jpg', '.jpeg', '.png', '.webp'):
-                if candidate in url_path:
-                    ext = candidate
-                    break
+        connector = aiohttp.TCPConnector(limit=_SLIDESHOW_CONCURRENCY)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            headers=_IMAGE_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=30),
+        ) as session:
+            await asyncio.gather(*(fetch_one(session, i, u) for i, u in enumerate(image_urls)))
 
-            try:
-                req = urllib.request.Request(img_url, headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                })
-                with urllib.request.urlopen(req, timeout=30) as resp:
-                    # Override extension based on actual content type
-                    content_type = resp.headers.get('Content-Type', '')
-                    if 'jpeg' in content_type or 'jpg' in content_type:
-                        ext = '.jpg'
-                    elif 'png' in content_type:
-                        ext = '.png'
-                    elif 'webp' in content_type:
-                        ext = '.webp'
-
-                    # Save with download_id as filename (for file-serving endpoint)
-                    file_path = os.path.join(target_dir, f"{image_id}{ext}")
-                    with open(file_path, 'wb') as f:
-                        f.write(resp.read())
-
-                file_size = os.path.getsize(file_path)
-                display_name = f"{safe_title}_{i + 1}{ext}"
-
-                result = {
-                    'download_id': image_id,
-                    'title': display_name,
-                    'file_path': file_path,
-                    'file_size': file_size,
-                    'format': ext.lstrip('.'),
-                }
-                results.append(result)
-                logger.info("Saved slideshow image %d/%d: %s -> %s", i + 1, total, display_name, image_id)
-
-                if progress_callback:
-                    progress_callback({
-                        "status": "image_complete",
-                        "image_index": i,
-                        "image_total": total,
-                        "result": result,
-                    })
+        return [r for r in results if r is not None]
 
-            except Exception as e:
-                logger.warning("Failed to download slideshow image %d/%d: %s", i + 1, total, e)
+    def _fetch_slideshow_image(self, i: int, total: int, img_url: str,
+                               target_dir: str, safe_title: str) -> Optional[Dict]:
+        """Save one slideshow image under a fresh download_id; None if it failed (logged)."""
+        image_id = str(uuid.uuid4())
+        try:
+            # Fetch into the cache first, then link the user's copy from there
+            cache_path, ext = self._ensure_cached_image(img_url)
 
-        if not results:
-            raise Exception("Failed to download any images.")
+            # Save with download_id as filename (for file-serving endpoint)
+            file_path = os.path.join(target_dir, f"{image_id}{ext}")
+            file_size = self._link_or_copy(cache_path, file_path)
+            return self._slideshow_image_result(i, total, image_id, file_path, file_size, ext, safe_title)
+        except Exception as e:
+            logger.warning("Failed to download slideshow image %d/%d: %s", i + 1, total, e)
+            return None
 
+    @staticmethod
+    def _slideshow_image_result(i: int, total: int, image_id: str, file_path: str,
+                                file_size: int, ext: str, safe_title: str) -> Dict:
+        """Build the per-image result dict for download_slideshow_images."""
+        display_name = f"{safe_title}_{i + 1}{ext}"
+        logger.info("Saved slideshow image %d/%d: %s -> %s", i + 1, total, display_name, image_id)
         return {
-            'results': results,
-            'saved_count': len(results),
-            'total_count': total,
+            'download_id': image_id,
+            'title': display_name,
+            'file_path': file_path,
+            'file_size': file_size,
+            'format': ext.lstrip('.'),
         }
 
     def get_profile_videos(self, profile_url: str, limit: int = 30, offset: int = 0,
                            user_cookie: Optional[str] = None) -> dict:
         profile_url = self._extract_url_from_text(profile_url)
-        ydl_opts = {
+        slots = self._extract_profile_page(profile_url, offset, limit, user_cookie)
+        videos = [v for v in slots if v]
+        # A full window of playlist positions means there may be more, even if some were dropped
+        has_more = len(slots) >= limit
+        logger.info("Found %d videos from %s (offset=%d, limit=%d, has_more=%s)",
+                    len(videos), profile_url, offset, limit, has_more)
+        return {"videos": videos, "has_more": has_more}
+
+    def _extract_profile_page(self, profile_url: str, offset: int, limit: int,
+                              user_cookie: Optional[str] = None) -> List[Optional[Dict]]:
+        """Return the playlist slots [offset, offset + limit), served from a cached prefix.
+
+        The first page fetches at least _PROFILE_PREFETCH entries; later scroll
+        pages slice that list and only fetch the missing tail. Windows past the
+        cached prefix are fetched as-is. The cache is per cookie, so a grid seen
+        with one user's cookies is never served to anyone else.
+        """
+        end = offset + limit
+        key = (profile_url, hashlib.sha256(user_cookie.encode()).hexdigest() if user_cookie else '')
+        cached = _profile_cache.get(key)
+        if cached is not None:
+            slots, exhausted = cached
+            fetched = len(slots)
+            if end <= fetched or exhausted:
+                return slots[offset:end]
+            if offset <= fetched:
+                target = max(end, fetched + _PROFILE_PREFETCH)
+                more = self._fetch_profile_window(profile_url, fetched, target, user_cookie)
+                slots = slots + more
+                _profile_cache[key] = (slots, len(more) < target - fetched)
+                return slots[offset:end]
+        elif offset == 0:
+            target = max(end, _PROFILE_PREFETCH)
+            slots = self._fetch_profile_window(profile_url, 0, target, user_cookie)
+            _profile_cache[key] = (slots, len(slots) < target)
+            return slots[:end]
+
+        return self._fetch_profile_window(profile_url, offset, end, user_cookie)
+
+    def _profile_ydl_opts(self) -> dict:
+        opts = {
             'extract_flat': True,
             'quiet': True,
             'no_warnings': True,
-            'playliststart': offset + 1,
-            'playlistend': offset + limit,
         }
         if self.ffmpeg_dir:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
+            opts['ffmpeg_location'] = self.ffmpeg_dir
+        return opts
+
+    def _shared_profile_ydl(self) -> yt_dlp.YoutubeDL:
+        """This thread's flat-playlist YoutubeDL; see _shared_info_ydl."""
+        ydl = getattr(_ydl_local, 'profile', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self._profile_ydl_opts())
+            _ydl_local.profile = ydl
+        return ydl
+
+    def _fetch_profile_window(self, profile_url: str, start: int, end: int,
+                              user_cookie: Optional[str] = None) -> List[Optional[Dict]]:
+        """Run one flat yt-dlp extraction for the playlist window [start, end).
+
+        Returns one slot per playlist entry, None for entries without an id, so
+        a short list means the playlist ran out before `end`.
+        """
+        window = {'playliststart': start + 1, 'playlistend': end}
         cookie_opts = self._get_cookie_opts(profile_url, user_cookie)
-        ydl_opts.update(cookie_opts)
+        if cookie_opts:
+            ydl_ctx = yt_dlp.YoutubeDL({**self._profile_ydl_opts(), **window, **cookie_opts})
+        else:
+            # The window is the only per-call option, so this thread's instance just takes new bounds
+            ydl = self._shared_profile_ydl()
+            ydl.params.update(window)
+            ydl_ctx = contextlib.nullcontext(ydl)
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with ydl_ctx as ydl:
                 info = ydl.extract_info(profile_url, download=False)
-                entries = info.get('entries', [])
-
-                videos = []
-                for e in entries:
-                    if not e:
-                        continue
-                    video_id = e.get('id')
-                    if not video_id:
-                        continue
-
-                    uploader = e.get('uploader') or info.get('uploader') or 'user'
-                    video_url = e.get('url') or e.get('webpage_url') or f'https://www.tiktok.com/@{uploader}/video/{video_id}'
-
-                    videos.append({
-                        'video_id': video_id,
-                        'title': e.get('title') or (e.get('description') or '')[:80] or 'TikTok Video',
-                        'url': video_url,
-                        'duration': e.get('duration'),
-                        'thumbnail': (
-                            e.get('thumbnails', [{}])[-1].get('url')
-                            if e.get('thumbnails') else e.get('thumbnail')
-                        ),
-                    })
-
-                has_more = len(videos) >= limit
-                logger.info("Found %d videos from %s (offset=%d, limit=%d, has_more=%s)",
-                            len(videos), profile_url, offset, limit, has_more)
-                return {"videos": videos, "has_more": has_more}
+                entries = list(info.get('entries') or [])
+                default_uploader = info.get('uploader') or 'user'
+                return [self._profile_entry(e, default_uploader) if e and e.get('id') else None
+                        for e in entries]
         finally:
             self._cleanup_cookie_opts(cookie_opts)
 
+    @staticmethod
+    def _profile_entry(e: Dict, default_uploader: str) -> Dict:
+        """Map one flat playlist entry to the profile-grid video dict."""
+        video_id = e['id']
+        uploader = e.get('uploader') or default_uploader
+        thumbnails = e.get('thumbnails')
+        return {
+            'video_id': video_id,
+            'title': e.get('title') or (e.get('description') or '')[:80] or 'TikTok Video',
+            'url': e.get('url') or e.get('webpage_url') or f'https://www.tiktok.com/@{uploader}/video/{video_id}',
+            'duration': e.get('duration'),
+            'thumbnail': thumbnails[-1].get('url') if thumbnails else e.get('thumbnail'),
+        }
+
     def is_profile_url(self, url: str) -> bool:
         try:
-            url = self._extract_url_from_text(url)
-            parsed = urlparse(url)
-            host = parsed.hostname or ''
-            path = parsed.path.lower().rstrip('/')
+            # /video/, /photo/, or /note/ = single post; most links are, so reject before parsing
+            if '/video/' in url or '/photo/' in url or '/note/' in url:
+                return False
+
+            host, path = self._classify_url(self._extract_url_from_text(url))
 
             # Short URLs always resolve to single videos
-            if 'vm.tiktok.com' in host or 'v.douyin.com' in host or 'vt.tiktok.com' in host:
+            if host in _SHORT_HOSTS:
                 return False
 
-            # /video/, /photo/, or /note/ in path = single post
+            # Same check on the normalised path, for mixed-case links
             if '/video/' in path or '/photo/' in path or '/note/' in path:
                 return False
 
             # TikTok: /@username with no further path = profile
-            if re.match(r'^/@[^/]+$', path):
+            if _PROFILE_AT_RE.match(path):
                 return True
 
             # Douyin: /user/<id> = profile (no extractor in yt-dlp, but detect it)
-            if 'douyin.com' in host and re.match(r'^/user/[^/]+$', path):
+            if 'douyin.com' in host and _DOUYIN_USER_RE.match(path):
                 return True
 
             return False
-        except:
+        except (TypeError, ValueError, AttributeError):
             return False
 
-    def _verify_merged_streams(self, file_path: str) -> dict:
-        """Verify the output file has both video and audio streams using ffprobe."""
-        import subprocess
-        import json as _json
+    @staticmethod
+    def _streams_from_info(info: Dict) -> Optional[dict]:
+        """_verify_merged_streams-style result from yt-dlp's chosen formats, or None if unsure.
 
-        ffprobe = 'ffprobe'
-        if self.ffmpeg_dir:
-            ffprobe_path = os.path.join(self.ffmpeg_dir, 'ffprobe')
-            if os.path.exists(ffprobe_path) or os.path.exists(ffprobe_path + '.exe'):
-                ffprobe = ffprobe_path
+        video_codec is None when the vcodec string isn't recognised; _ensure_mp4_h264
+        then reads it from the file header.
+        """
+        formats = info.get('requested_formats') or [info]
+        vcodec = next((f['vcodec'] for f in formats if f.get('vcodec') not in (None, 'none')), None)
+        acodec = next((f['acodec'] for f in formats if f.get('acodec') not in (None, 'none')), None)
+        if not vcodec or not acodec:
+            return None
+        vcodec = vcodec.lower()
+        video_codec = next((name for prefix, name in _YTDLP_VCODEC_PREFIXES if vcodec.startswith(prefix)), None)
+        return {"has_video": True, "has_audio": True, "video_codec": video_codec, "audio_codec": acodec}
 
-        result = {"has_video": False, "has_audio": False, "video_codec": None, "audio_codec": None}
-        try:
-            proc = subprocess.run(
-                [ffprobe, '-v', 'quiet', '-show_streams', '-of', 'json', file_path],
-                capture_output=True, text=True, timeout=15
-            )
-            if proc.returncode != 0:
-                logger.warning("ffprobe failed for %s: %s", file_path, proc.stderr)
-                return result
+    @staticmethod
+    def _probe_streams_av(file_path: str) -> Optional[dict]:
+        """_verify_merged_streams result read in-process through PyAV, or None.
 
-            data = _json.loads(proc.stdout)
-            for stream in data.get('streams', []):
-                if stream.get('codec_type') == 'video':
-                    result['has_video'] = True
-                    result['video_codec'] = stream.get('codec_name')
-                elif stream.get('codec_type') == 'audio':
-                    result['has_audio'] = True
-                    result['audio_codec'] = stream.get('codec_name')
-
-            logger.info(
-                "Stream verify for %s: video=%s(%s) audio=%s(%s)",
-                os.path.basename(file_path),
-                result['has_video'], result['video_codec'],
-                result['has_audio'], result['audio_codec'],
-            )
+        Opens the file with libavformat directly, so no ffprobe process is
+        forked. None if PyAV isn't installed or can't open the file.
+        """
+        if av is None:
+            return None
+        try:
+            with av.open(file_path) as container:
+                video = container.streams.video
+                audio = container.streams.audio
+                return {
+                    "has_video": bool(video),
+                    "has_audio": bool(audio),
+                    "video_codec": video[0].codec_context.name if video else None,
+                    "audio_codec": audio[0].codec_context.name if audio else None,
+                }
         except Exception as e:
-            logger.warning("Stream verification failed: %s", e)
+            logger.debug("PyAV probe failed for %s: %s", file_path, e)
+            return None
 
+    def _verify_merged_streams(self, file_path: str) -> dict:
+        """Verify the output file has both video and audio streams (PyAV, else ffprobe)."""
+        import subprocess
+
+        result = self._probe_streams_av(file_path)
+        if result is None:
+            result = {"has_video": False, "has_audio": False, "video_codec": None, "audio_codec": None}
+            try:
+                proc = subprocess.run(
+                    [self._ffprobe_bin, '-v', 'quiet', '-show_entries', 'stream=codec_type,codec_name',
+                     '-of', 'csv=p=0', file_path],
+                    capture_output=True, timeout=15
+                )
+                if proc.returncode != 0:
+                    logger.warning("ffprobe failed for %s: %s", file_path, proc.stderr.decode(errors='replace'))
+                    return result
+
+                # One "codec_name,codec_type" line per stream (ffprobe picks the field order).
+                # Parsed as bytes; only the codec names get decoded.
+                for line in proc.stdout.splitlines():
+                    fields = line.strip().split(b',')
+                    if b'video' in fields:
+                        result['has_video'] = True
+                        codec = next((f for f in fields if f != b'video'), None)
+                        result['video_codec'] = codec.decode() if codec else None
+                    elif b'audio' in fields:
+                        result['has_audio'] = True
+                        codec = next((f for f in fields if f != b'audio'), None)
+                        result['audio_codec'] = codec.decode() if codec else None
+            except Exception as e:
+                logger.warning("Stream verification failed: %s", e)
+                return result
+
+        logger.info(
+            "Stream verify for %s: video=%s(%s) audio=%s(%s)",
+            os.path.basename(file_path),
+            result['has_video'], result['video_codec'],
+            result['has_audio'], result['audio_codec'],
+        )
         return result
 
-    def _merge_streams_fallback(self, target_dir: str, download_id: str) -> Optional[str]:
+    @staticmethod
+    def _ffmpeg_error(stderr: bytes) -> str:
+        """Last line of ffmpeg's (error-level) stderr, for log messages."""
+        lines = stderr.decode(errors='replace').strip().splitlines()
+        return lines[-1] if lines else 'no error output'
+
+    def _merge_streams_fallback(self, target_dir: str, download_id: str,
+                                entries: Optional[Dict[str, os.DirEntry]] = None) -> Optional[str]:
         """Manually merge separate video+audio files if yt-dlp's auto-merge failed."""
         import subprocess
 
-        ffmpeg_bin = 'ffmpeg'
-        if self.ffmpeg_dir:
-            candidate = os.path.join(self.ffmpeg_dir, 'ffmpeg')
-            if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
-                ffmpeg_bin = candidate
+        if entries is None:
+            entries = scan_download_files(target_dir, download_id)
 
         video_file = None
         audio_file = None
-        for f in os.listdir(target_dir):
-            if not f.startswith(download_id) or f.endswith('.part'):
+        for f, entry in entries.items():
+            if f.endswith('.part'):
                 continue
-            path = os.path.join(target_dir, f)
+            path = entry.path
             parts = f[len(download_id):]
             if parts.count('.') <= 1:
                 continue
@@ -1027,12 +1628,22 @@ class TikTokService:
         merged_path = os.path.join(target_dir, f'{download_id}.mp4')
         logger.info("Fallback merge: %s + %s -> %s", os.path.basename(video_file), os.path.basename(audio_file), os.path.basename(merged_path))
 
+        # .m4a audio is AAC already — stream-copy it and only transcode if that fails
+        audio_args = [['-c:a', 'aac', '-b:a', '192k']]
+        if audio_file.lower().endswith('.m4a'):
+            audio_args.insert(0, ['-c:a', 'copy'])
+
         try:
-            subprocess.run(
-                [ffmpeg_bin, '-i', video_file, '-i', audio_file,
-                 '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k', '-y', merged_path],
-                capture_output=True, timeout=600
-            )
+            for a_args in audio_args:
+                result = subprocess.run(
+                    [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', video_file, '-i', audio_file,
+                     '-c:v', 'copy', *a_args, '-movflags', '+faststart', '-y', merged_path],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=600
+                )
+                if result.returncode == 0:
+                    break
+                logger.warning("Fallback merge with %s failed (exit %d): %s", ' '.join(a_args),
+                               result.returncode, self._ffmpeg_error(result.stderr))
             if os.path.exists(merged_path) and os.path.getsize(merged_path) > 0:
                 logger.info("Fallback merge succeeded: %s", os.path.basename(merged_path))
                 return merged_path
@@ -1046,72 +1657,139 @@ class TikTokService:
     def _cleanup_intermediate_files(self, target_dir: str, download_id: str, final_file: str):
         """Remove leftover intermediate stream files."""
         final_basename = os.path.basename(final_file)
-        for f in os.listdir(target_dir):
-            if f.startswith(download_id) and f != final_basename:
-                path = os.path.join(target_dir, f)
+        for f, entry in scan_download_files(target_dir, download_id).items():
+            if f != final_basename:
                 try:
-                    os.remove(path)
+                    os.remove(entry.path)
                     logger.info("Cleaned up intermediate file: %s", f)
                 except OSError as e:
                     logger.warning("Failed to clean up %s: %s", f, e)
 
-    def _ensure_mp4_h264(self, file_path: str) -> str:
-        import subprocess
-
-        ffprobe = 'ffprobe'
-        if self.ffmpeg_dir:
-            ffprobe_path = os.path.join(self.ffmpeg_dir, 'ffprobe')
-            if os.path.exists(ffprobe_path) or os.path.exists(ffprobe_path + '.exe'):
-                ffprobe = ffprobe_path
+    @staticmethod
+    def _sniff_mp4_video_codec(file_path: str) -> Optional[str]:
+        """Return the video codec named in the MP4 sample descriptions, without ffprobe.
 
+        Walks the top-level boxes to `moov` (seeking past `mdat`), then reads the
+        first sample-entry FourCC of each `stsd`. Returns None if the header
+        can't be parsed or names no known video codec.
+        """
         try:
-            result = subprocess.run(
-                [ffprobe, '-v', 'quiet', '-select_streams', 'v:0',
-                 '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', file_path],
-                capture_output=True, text=True, timeout=10
-            )
-            codec = result.stdout.strip()
-            logger.info("TikTok MP4 video codec: %s for %s", codec, os.path.basename(file_path))
+            with open(file_path, 'rb') as f:
+                while True:
+                    header = f.read(8)
+                    if len(header) < 8:
+                        return None
+                    size, box_type = struct.unpack('>I4s', header)
+                    header_len = 8
+                    if size == 1:
+                        size = struct.unpack('>Q', f.read(8))[0]
+                        header_len = 16
+                    elif size < 8:
+                        return None  # size 0 = box runs to EOF; anything else is corrupt
+                    if box_type == b'moov':
+                        if size - header_len > _MOOV_SNIFF_MAX:
+                            return None
+                        moov = f.read(size - header_len)
+                        break
+                    f.seek(size - header_len, os.SEEK_CUR)
+        except (OSError, struct.error):
+            return None
 
-            if codec in ('h264', 'avc1', ''):
-                return file_path
-        except Exception as e:
-            logger.warning("ffprobe check failed: %s", e)
-            return file_path
+        # stsd layout after its type: version/flags(4) entry_count(4) entry_size(4) entry_type(4)
+        pos = moov.find(b'stsd')
+        while pos != -1:
+            codec = _MP4_VIDEO_FOURCCS.get(moov[pos + 16:pos + 20])
+            if codec:
+                return codec
+            pos = moov.find(b'stsd', pos + 4)
+        return None
 
-        logger.info("Re-encoding %s from %s to H.264", os.path.basename(file_path), codec)
-        fixed_path = file_path.replace('.mp4', '_fixed.mp4')
+    def _ensure_mp4_h264(self, file_path: str, codec: Optional[str] = None) -> str:
+        """Re-encode to H.264 if needed. Pass `codec` when a previous probe of this file already found it."""
+        import subprocess
 
-        ffmpeg_bin = 'ffmpeg'
-        if self.ffmpeg_dir:
-            ffmpeg_candidate = os.path.join(self.ffmpeg_dir, 'ffmpeg')
-            if os.path.exists(ffmpeg_candidate) or os.path.exists(ffmpeg_candidate + '.exe'):
-                ffmpeg_bin = ffmpeg_candidate
+        # Read the codec straight from the MP4 header, then via PyAV; only spawn ffprobe if both fail
+        if codec is None:
+            codec = self._sniff_mp4_video_codec(file_path)
+        if codec is None:
+            streams = self._probe_streams_av(file_path)
+            if streams is not None:
+                codec = streams['video_codec'] or ''
+        if codec is None:
+            try:
+                result = subprocess.run(
+                    [self._ffprobe_bin, '-v', 'quiet', '-select_streams', 'v:0',
+                     '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', file_path],
+                    capture_output=True, timeout=10
+                )
+                codec = result.stdout.strip().decode(errors='replace')
+            except Exception as e:
+                logger.warning("ffprobe check failed: %s", e)
+                return file_path
+        logger.info("TikTok MP4 video codec: %s for %s", codec, os.path.basename(file_path))
+
+        root, ext = os.path.splitext(file_path)
+        fixed_path = root + '_fixed.mp4'
+        # Every attempt writes a faststart MP4, so players can range-request without a second pass
+        slots = contextlib.nullcontext()
+        if codec in ('h264', 'avc1'):
+            if ext.lower() == '.mp4':
+                return file_path
+            # Already H.264, just not in MP4 — copying the streams is ~100x faster than re-encoding
+            logger.info("Remuxing %s into MP4", os.path.basename(file_path))
+            attempts = [
+                ('remux', [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', file_path, '-c', 'copy',
+                           '-movflags', '+faststart', '-y', fixed_path]),
+                # e.g. Vorbis audio, which MP4 can't carry
+                ('remux+aac', [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', file_path, '-c:v', 'copy', '-c:a', 'aac',
+                               '-b:a', '192k', '-movflags', '+faststart', '-y', fixed_path]),
+            ]
+        elif not codec:
+            return file_path
+        else:
+            logger.info("Re-encoding %s from %s to H.264", os.path.basename(file_path), codec)
+            slots = REENCODE_SLOTS
+            attempts = []
+            if self._hw_encoder:
+                encoder, in_args, out_args = HW_ENCODERS[self._hw_encoder]
+                attempts.append((encoder, [self._ffmpeg_bin, *_FFMPEG_QUIET, *in_args, '-i', file_path,
+                                           '-c:v', encoder, *out_args, '-c:a', 'copy',
+                                           *REENCODE_MUX_ARGS, '-y', fixed_path]))
+            attempts.append(('libx264', [self._ffmpeg_bin, *_FFMPEG_QUIET, '-i', file_path, '-c:v', 'libx264',
+                                         '-preset', 'ultrafast', '-crf', '23', '-c:a', 'copy',
+                                         *REENCODE_MUX_ARGS, '-y', fixed_path]))
 
         try:
-            subprocess.run(
-                [ffmpeg_bin, '-i', file_path, '-c:v', 'libx264', '-preset', 'ultrafast',
-                 '-crf', '23', '-c:a', 'copy', '-y', fixed_path],
-                capture_output=True, timeout=600
-            )
+            with slots:
+                for label, cmd in attempts:
+                    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=600)
+                    if result.returncode == 0:
+                        break
+                    logger.warning("Conversion with %s failed (exit %d): %s", label, result.returncode,
+                                   self._ffmpeg_error(result.stderr))
             if os.path.exists(fixed_path) and os.path.getsize(fixed_path) > 0:
-                os.remove(file_path)
-                os.rename(fixed_path, file_path)
-                logger.info("Re-encode complete: %s", os.path.basename(file_path))
+                mp4_path = root + '.mp4'
+                os.replace(fixed_path, mp4_path)
+                if mp4_path != file_path:
+                    os.remove(file_path)
+                    file_path = mp4_path
+                logger.info("Conversion complete: %s", os.path.basename(file_path))
             else:
-                logger.warning("Re-encode produced empty file, keeping original")
+                logger.warning("Conversion produced empty file, keeping original")
                 if os.path.exists(fixed_path):
                     os.remove(fixed_path)
         except Exception as e:
-            logger.error("Re-encode failed: %s", e)
+            logger.error("Conversion failed: %s", e)
             if os.path.exists(fixed_path):
                 os.remove(fixed_path)
 
         return file_path
 
-    def _sanitize_filename(self, name: str) -> str:
-        name = re.sub(r'[<>:"/\\|?*]', '', name)
-        name = re.sub(r'\s+', ' ', name).strip()
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _sanitize_filename(name: str) -> str:
+        name = _SANITIZE_BAD_RE.sub('', name)
+        name = _SANITIZE_WS_RE.sub(' ', name).strip()
         if len(name) > 200:
             name = name[:200].strip()
         return name or 'untitled'
@@ -1122,34 +1800,38 @@ class TikTokService:
         target_dir = os.path.dirname(file_path)
         ext = os.path.splitext(file_path)[1]
         safe_title = self._sanitize_filename(title)
-        new_path = os.path.join(target_dir, f"{safe_title}{ext}")
-        if os.path.exists(new_path) and os.path.abspath(new_path) != os.path.abspath(file_path):
-            counter = 1
-            while os.path.exists(new_path):
-                new_path = os.path.join(target_dir, f"{safe_title} ({counter}){ext}")
-                counter += 1
+        new_path = None
         try:
-            os.rename(file_path, new_path)
+            new_path = unique_path(target_dir, safe_title, ext, current=os.path.basename(file_path))
+            # new_path is already reserved, so replace it rather than checking again
+            os.replace(file_path, new_path)
             logger.info("Renamed: %s -> %s", os.path.basename(file_path), os.path.basename(new_path))
             return new_path
         except Exception as e:
             logger.warning("Failed to rename file: %s", e)
+            if new_path and new_path != file_path and os.path.exists(file_path):
+                try:
+                    os.remove(new_path)  # drop the empty placeholder
+                except OSError:
+                    pass
             return file_path
 
-    def _find_output_file(self, target_dir: str, download_id: str, expected_ext: str) -> Optional[str]:
-        expected_path = os.path.join(target_dir, f'{download_id}.{expected_ext}')
-        if os.path.exists(expected_path):
-            return expected_path
-        candidates = []
-        for f in os.listdir(target_dir):
-            if f.startswith(download_id) and not f.endswith('.part'):
-                parts = f[len(download_id):]
-                if parts.count('.') <= 1:
-                    candidates.append(os.path.join(target_dir, f))
-        if not candidates:
-            for f in os.listdir(target_dir):
-                if f.startswith(download_id) and not f.endswith('.part'):
-                    candidates.append(os.path.join(target_dir, f))
-        if candidates:
-            return max(candidates, key=os.path.getsize)
-        return None
+    def _find_output_file(self, target_dir: str, download_id: str, expected_ext: str,
+                          entries: Optional[Dict[str, os.DirEntry]] = None) -> Optional[str]:
+        if entries is None:
+            entries = scan_download_files(target_dir, download_id)
+        expected = entries.get(f'{download_id}.{expected_ext}')
+        if expected is not None:
+            return expected.path
+        # One pass: largest final-looking file (single extension), else largest of anything
+        best = best_any = None  # (size, path)
+        for f, entry in entries.items():
+            if f.endswith('.part'):
+                continue
+            size = entry.stat().st_size
+            if best_any is None or size > best_any[0]:
+                best_any = (size, entry.path)
+            if f[len(download_id):].count('.') <= 1 and (best is None or size > best[0]):
+                best = (size, entry.path)
+        pick = best or best_any
+        return pick[1] if pick else None
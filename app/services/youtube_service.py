@@ -1,18 +1,85 @@
 import yt_dlp
+from yt_dlp.extractor.youtube import YoutubeIE, YoutubeTabIE
+import functools
+import hashlib
+import json
 import os
 import re
 import time
 import logging
+import threading
 import uuid
 import shutil
-from typing import Optional, Dict, List
+import subprocess
+import tempfile
+from typing import Callable, Optional, Dict, List, Tuple
 from app.settings.config import settings
+from app.services.ttl_cache import TTLCache
+from app.services.download_files import scan_download_files, unique_path
+from app.services.hwaccel import HW_ENCODERS, REENCODE_MUX_ARGS, REENCODE_SLOTS, pick_hw_encoder
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # optional — stdlib json is slower on ffprobe's multi-KB output
+    from json import loads as _json_loads
 
 logger = logging.getLogger("turboclip.youtube")
 
-# Simple TTL cache for video info (avoids repeated yt-dlp calls for same URL)
-_info_cache: Dict[str, dict] = {}
+# Video info cache: url -> (info, fetched_at). Entries are fresh for _INFO_CACHE_TTL,
+# then served stale for up to _INFO_STALE_GRACE while a background thread refetches them.
 _INFO_CACHE_TTL = 600  # 10 minutes
+_INFO_STALE_GRACE = 3600
+_info_cache = TTLCache(maxsize=1024, ttl=_INFO_CACHE_TTL + _INFO_STALE_GRACE)
+# Single-flight for lookups: url -> Event set once the running fetch finishes
+_info_inflight: Dict[str, threading.Event] = {}
+_info_inflight_lock = threading.Lock()
+_INFO_INFLIGHT_WAIT = 60  # seconds a follower waits before giving up and extracting itself
+# The same entries persist in download_dir/.info_cache (one JSON file per URL hash), so
+# restarts and sibling workers skip the 2-5 s extraction; age comes from the file's mtime
+_INFO_DISK_SWEEP_EVERY = 3600
+
+# Transfer options for actual downloads: DASH/HLS fragments fetch in parallel, and plain
+# HTTPS formats are pulled in 10 MiB ranges, which dodges YouTube's per-connection throttling
+_DOWNLOAD_YDL_OPTS = {
+    'concurrent_fragment_downloads': 8,
+    'fragment_retries': 10,
+    'retries': 10,
+    'http_chunk_size': 10 * 1024 * 1024,
+}
+
+# Post-download stream verification history per (quality, format): [verified ok, total].
+# A combo with enough clean history skips the ffprobe pass except for every Nth download;
+# halving at _VERIFY_WINDOW keeps the rate weighted towards recent downloads.
+_VERIFY_TRUST_MIN = 200
+_VERIFY_TRUST_RATE = 0.99
+_VERIFY_WINDOW = 1000
+_VERIFY_SAMPLE_EVERY = 20
+
+# Per-thread YoutubeDL instances for metadata lookups (see YouTubeService._shared_ydl)
+_ydl_local = threading.local()
+
+_YOUTUBE_HOST_RE = re.compile(r'^https?://(?:(?:www|m|music)\.)?(?:youtube\.com|youtu\.be)/', re.IGNORECASE)
+_SANITIZE_BAD_RE = re.compile(r'[<>:"/\\|?*]')
+_SANITIZE_WS_RE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=256)
+def _probe_cached(ffprobe: str, path: str, mtime_ns: int, size: int) -> Tuple[Tuple[str, str], ...]:
+    """ffprobe a file once per (path, mtime, size): ((codec_type, codec_name), ...).
+
+    Failures raise instead of returning None, so lru_cache doesn't pin a
+    transient timeout or exit code to that file version.
+    """
+    proc = subprocess.run(
+        [ffprobe, '-v', 'quiet', '-show_streams', '-of', 'json', path],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=15
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"exit {proc.returncode}")
+    return tuple(
+        (stream.get('codec_type') or '', stream.get('codec_name') or '')
+        for stream in _json_loads(proc.stdout).get('streams', [])
+    )
 
 
 class YouTubeService:
@@ -24,8 +91,10 @@ class YouTubeService:
         self.ffmpeg_dir = None
         if settings.FFMPEG_PATH and os.path.isdir(settings.FFMPEG_PATH):
             self.ffmpeg_dir = settings.FFMPEG_PATH
-        elif shutil.which('ffmpeg'):
-            self.ffmpeg_dir = os.path.dirname(shutil.which('ffmpeg'))
+        else:
+            found = shutil.which('ffmpeg')
+            if found:
+                self.ffmpeg_dir = os.path.dirname(found)
 
         if not self.ffmpeg_dir:
             logger.warning(
@@ -33,51 +102,190 @@ class YouTubeService:
                 "Set FFMPEG_PATH in .env or install ffmpeg to your system PATH."
             )
 
-    def get_video_info(self, url: str) -> Dict:
-        # Check cache first
-        cached = _info_cache.get(url)
-        if cached and time.time() - cached["_ts"] < _INFO_CACHE_TTL:
-            logger.debug("Video info cache hit: %s", url)
-            return cached["data"]
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-        }
+        # Options shared by every YoutubeDL this service builds
+        self._base_ydl_opts = {'quiet': True, 'no_warnings': True}
         if self.ffmpeg_dir:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
+            self._base_ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
+        if settings.YTDLP_CACHE_DIR:
+            # Deciphered player signatures persist here, so restarts skip the JS interpreter
+            self._base_ydl_opts['cachedir'] = settings.YTDLP_CACHE_DIR
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-
-            formats = []
-            for f in info.get('formats', []):
-                if f.get('vcodec') != 'none':
-                    formats.append({
-                        'format_id': f.get('format_id'),
-                        'ext': f.get('ext'),
-                        'quality': f.get('format_note') or f.get('height', 'unknown'),
-                        'filesize': f.get('filesize') or f.get('filesize_approx'),
-                        'has_audio': f.get('acodec') != 'none'
-                    })
-
-            result = {
-                'video_id': info.get('id'),
-                'title': info.get('title'),
-                'duration': info.get('duration'),
-                'thumbnail': info.get('thumbnail'),
-                'uploader': info.get('uploader'),
-                'upload_date': info.get('upload_date'),
-                'description': info.get('description'),
-                'view_count': info.get('view_count'),
-                'tags': info.get('tags') or [],
-                'available_formats': formats
-            }
+        self._info_cache_dir = os.path.join(self.download_dir, '.info_cache')
+        os.makedirs(self._info_cache_dir, exist_ok=True)
+        self._info_cache_swept = 0.0
+
+        # Resolve tool paths once instead of probing the filesystem per call
+        self._ffmpeg_bin = self._resolve_ff_binary('ffmpeg')
+        self._ffprobe_bin = self._resolve_ff_binary('ffprobe')
+
+        # Optional hardware encoder for H.264 re-encodes (settings.HWACCEL), probed once
+        self._hw_encoder = pick_hw_encoder(self._ffmpeg_bin, settings.HWACCEL)
 
-            _info_cache[url] = {"data": result, "_ts": time.time()}
+        self._verify_stats: Dict[Tuple[str, str], List[int]] = {}
+        self._verify_lock = threading.Lock()
+        self._verify_skips = 0
 
+    def _resolve_ff_binary(self, name: str) -> str:
+        """Return the path to an FFmpeg tool inside ffmpeg_dir, or the bare name to use PATH."""
+        if self.ffmpeg_dir:
+            candidate = os.path.join(self.ffmpeg_dir, name)
+            if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
+                return candidate
+        return name
+
+    def get_video_info(self, url: str) -> Dict:
+        """Video metadata, from the cache when possible.
+
+        A stale entry is returned immediately and refreshed in the background;
+        concurrent misses for one URL share a single yt-dlp extraction.
+        """
+        cached = _info_cache.get(url) or self._load_disk_info(url)
+        if cached is not None:
+            result, fetched_at = cached
+            if time.monotonic() - fetched_at >= _INFO_CACHE_TTL:
+                event, leader = self._begin_info_fetch(url)
+                if leader:
+                    threading.Thread(target=self._refresh_info, args=(url, event), daemon=True).start()
             return result
 
+        event, leader = self._begin_info_fetch(url)
+        if not leader:
+            event.wait(_INFO_INFLIGHT_WAIT)
+            cached = _info_cache.get(url) or self._load_disk_info(url)
+            if cached is not None:
+                return cached[0]
+            # The leader failed or is stuck — try on our own
+        try:
+            return self._fetch_video_info(url)
+        finally:
+            if leader:
+                self._end_info_fetch(url, event)
+
+    @staticmethod
+    def _begin_info_fetch(url: str) -> Tuple[threading.Event, bool]:
+        """Join the fetch in flight for `url`, or register a new one. Returns (event, is_leader)."""
+        with _info_inflight_lock:
+            event = _info_inflight.get(url)
+            if event is not None:
+                return event, False
+            event = _info_inflight[url] = threading.Event()
+            return event, True
+
+    @staticmethod
+    def _end_info_fetch(url: str, event: threading.Event):
+        with _info_inflight_lock:
+            del _info_inflight[url]
+        event.set()
+
+    def _refresh_info(self, url: str, event: threading.Event):
+        """Background refetch of a stale cache entry."""
+        try:
+            self._fetch_video_info(url)
+        except Exception as e:
+            logger.warning("Background info refresh failed for %s: %s", url, e)
+        finally:
+            self._end_info_fetch(url, event)
+
+    def _shared_ydl(self, kind: str, **opts) -> yt_dlp.YoutubeDL:
+        """Return this thread's YoutubeDL for `kind`, creating it from the base opts on first use.
+
+        Building a YoutubeDL (extractor registry, opener, cookie jar) costs tens
+        of ms and each one keeps its own connections; metadata lookups run on
+        reused worker threads, so one instance per thread and kind avoids both
+        without sharing a YoutubeDL across threads. Downloads carry per-call
+        hooks and output paths, so they still build their own.
+        """
+        ydl = getattr(_ydl_local, kind, None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({**self._base_ydl_opts, **opts})
+            setattr(_ydl_local, kind, ydl)
+        return ydl
+
+    def _disk_info_path(self, url: str) -> str:
+        return os.path.join(self._info_cache_dir, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def _load_disk_info(self, url: str) -> Optional[Tuple[Dict, float]]:
+        """Load a persisted info entry into the memory cache; None if missing or too old."""
+        path = self._disk_info_path(url)
+        try:
+            age = max(time.time() - os.stat(path).st_mtime, 0.0)
+            if age >= _INFO_CACHE_TTL + _INFO_STALE_GRACE:
+                return None
+            with open(path, 'rb') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        entry = (result, time.monotonic() - age)
+        _info_cache[url] = entry
+        return entry
+
+    def _store_disk_info(self, url: str, result: Dict):
+        """Persist an info entry; write-then-rename so other workers never read half a file."""
+        path = self._disk_info_path(url)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Failed to persist video info for %s: %s", url, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        self._sweep_disk_info()
+
+    def _sweep_disk_info(self):
+        """Drop persisted entries past their stale grace; runs at most once an hour."""
+        now = time.time()
+        if now - self._info_cache_swept < _INFO_DISK_SWEEP_EVERY:
+            return
+        self._info_cache_swept = now
+        cutoff = now - _INFO_CACHE_TTL - _INFO_STALE_GRACE
+        try:
+            with os.scandir(self._info_cache_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning("Failed to sweep video info cache: %s", e)
+
+    def _fetch_video_info(self, url: str) -> Dict:
+        """Uncached yt-dlp metadata lookup; stores the result in _info_cache."""
+        info = self._shared_ydl('info', extract_flat=False).extract_info(url, download=False)
+
+        formats = []
+        for f in info.get('formats', []):
+            if f.get('vcodec') != 'none':
+                formats.append({
+                    'format_id': f.get('format_id'),
+                    'ext': f.get('ext'),
+                    'quality': f.get('format_note') or f.get('height', 'unknown'),
+                    'filesize': f.get('filesize') or f.get('filesize_approx'),
+                    'has_audio': f.get('acodec') != 'none'
+                })
+
+        result = {
+            'video_id': info.get('id'),
+            'title': info.get('title'),
+            'duration': info.get('duration'),
+            'thumbnail': info.get('thumbnail'),
+            'uploader': info.get('uploader'),
+            'upload_date': info.get('upload_date'),
+            'description': info.get('description'),
+            'view_count': info.get('view_count'),
+            'tags': info.get('tags') or [],
+            'available_formats': formats
+        }
+
+        _info_cache[url] = (result, time.monotonic())
+        self._store_disk_info(url, result)
+
+        return result
+
     def download_video(self, url: str, format: str = "mp4", quality: str = "720p", progress_callback: Optional[callable] = None, download_dir: Optional[str] = None) -> Dict:
         download_id = str(uuid.uuid4())
         target_dir = download_dir or self.download_dir
@@ -107,17 +315,14 @@ class YouTubeService:
 
         format_selector = quality_map.get(quality, quality_map['720p'])
 
+        # Base opts carry ffmpeg_location (BUG 1 FIX: yt-dlp needs it to merge video+audio)
         ydl_opts = {
+            **self._base_ydl_opts,
+            **_DOWNLOAD_YDL_OPTS,
             'format': format_selector,
             'outtmpl': output_template,
-            'quiet': True,
-            'no_warnings': True,
         }
 
-        # BUG 1 FIX: Tell yt-dlp where ffmpeg is so it can merge video+audio
-        if self.ffmpeg_dir:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
-
         # Set the output container format
         if format in ('mp4', 'mkv', 'webm'):
             ydl_opts['merge_output_format'] = format
@@ -136,7 +341,9 @@ class YouTubeService:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
 
-            downloaded_file = self._find_output_file(target_dir, download_id, format)
+            # One directory scan serves both the output lookup and the fallback merge
+            entries = scan_download_files(target_dir, download_id)
+            downloaded_file = self._find_output_file(target_dir, download_id, format, entries)
 
             if not downloaded_file:
                 raise Exception(
@@ -145,14 +352,18 @@ class YouTubeService:
                     f"ffmpeg_dir={self.ffmpeg_dir}"
                 )
 
-            # Verify the merged file has both video and audio streams
-            streams = self._verify_merged_streams(downloaded_file)
+            # Verify the merged file has both video and audio streams, unless this
+            # quality/format has a clean track record and yt-dlp reported both codecs
+            streams = self._trusted_streams(quality, format, info)
+            if streams is None:
+                streams = self._verify_merged_streams(downloaded_file)
+                self._record_verify(quality, format, streams['has_video'] and streams['has_audio'])
             if not streams['has_video'] or not streams['has_audio']:
                 logger.warning(
                     "Merged file missing streams (video=%s, audio=%s). Attempting fallback merge.",
                     streams['has_video'], streams['has_audio']
                 )
-                fallback = self._merge_streams_fallback(target_dir, download_id, format)
+                fallback = self._merge_streams_fallback(target_dir, download_id, format, entries)
                 if fallback:
                     downloaded_file = fallback
                     streams = self._verify_merged_streams(downloaded_file)
@@ -161,9 +372,11 @@ class YouTubeService:
                 else:
                     logger.error("Fallback merge failed — serving file as-is")
 
-            # If MP4, verify the video codec is compatible (not VP9/AV1).
-            if format == 'mp4':
-                downloaded_file = self._ensure_mp4_h264(downloaded_file)
+            # If MP4, verify the video codec is compatible (not VP9/AV1). The verify
+            # probe above already read it, unless that probe failed.
+            if format == 'mp4' and settings.MP4_STRICT_H264:
+                downloaded_file = self._ensure_mp4_h264(downloaded_file, streams['video_codec'],
+                                                        info.get('duration'), progress_callback)
 
             # Clean up leftover intermediate stream files
             self._cleanup_intermediate_files(target_dir, download_id, downloaded_file)
@@ -191,10 +404,10 @@ class YouTubeService:
         output_template = os.path.join(target_dir, f'{download_id}.%(ext)s')
 
         ydl_opts = {
+            **self._base_ydl_opts,
+            **_DOWNLOAD_YDL_OPTS,
             'format': 'bestaudio/best',
             'outtmpl': output_template,
-            'quiet': True,
-            'no_warnings': True,
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
                 'preferredcodec': format,
@@ -202,9 +415,6 @@ class YouTubeService:
             }],
         }
 
-        if self.ffmpeg_dir:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
-
         if progress_callback:
             ydl_opts['progress_hooks'] = [progress_callback]
 
@@ -244,122 +454,152 @@ class YouTubeService:
         if not url.endswith('/shorts'):
             url += '/shorts'
 
-        ydl_opts = {
-            'extract_flat': True,
-            'quiet': True,
-            'no_warnings': True,
-            'playliststart': offset + 1,
-            'playlistend': offset + limit,
+        # The page window is the only per-call option, so this thread's instance just takes new bounds
+        ydl = self._shared_ydl('flat', extract_flat=True)
+        ydl.params.update({'playliststart': offset + 1, 'playlistend': offset + limit})
+        info = ydl.extract_info(url, download=False)
+        entries = info.get('entries') or ()
+        shorts = [self._short_entry(e) for e in entries if e and e.get('id')]
+
+        has_more = len(shorts) >= limit
+        logger.info("Found %d shorts from %s (offset=%d, limit=%d, has_more=%s)",
+                    len(shorts), channel_url, offset, limit, has_more)
+        return {"videos": shorts, "has_more": has_more}
+
+    @staticmethod
+    def _short_entry(e: Dict) -> Dict:
+        """Map one flat channel-playlist entry to the shorts-grid video dict."""
+        video_id = e['id']
+        thumbnails = e.get('thumbnails')
+        return {
+            'video_id': video_id,
+            'title': e.get('title') or 'Untitled',
+            'url': f'https://www.youtube.com/watch?v={video_id}',
+            'duration': e.get('duration'),
+            'thumbnail': thumbnails[-1].get('url') if thumbnails else None,
         }
-        if self.ffmpeg_dir:
-            ydl_opts['ffmpeg_location'] = self.ffmpeg_dir
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            entries = info.get('entries', [])
-
-            shorts = []
-            for e in entries:
-                if not e:
-                    continue
-                video_id = e.get('id')
-                if not video_id:
-                    continue
-                shorts.append({
-                    'video_id': video_id,
-                    'title': e.get('title') or 'Untitled',
-                    'url': f'https://www.youtube.com/watch?v={video_id}',
-                    'duration': e.get('duration'),
-                    'thumbnail': e.get('thumbnails', [{}])[-1].get('url') if e.get('thumbnails') else None,
-                })
-
-            has_more = len(shorts) >= limit
-            logger.info("Found %d shorts from %s (offset=%d, limit=%d, has_more=%s)",
-                        len(shorts), channel_url, offset, limit, has_more)
-            return {"videos": shorts, "has_more": has_more}
 
     def validate_url(self, url: str) -> bool:
+        # Usual hosts: ask the YouTube extractors' own URL patterns — no network round trip
+        if _YOUTUBE_HOST_RE.match(url):
+            return YoutubeIE.suitable(url) or YoutubeTabIE.suitable(url)
+        # Anything else needs the network; a short socket timeout keeps a dead host from pinning the caller
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(url, download=False, process=False)
-                return info.get('extractor_key', '').lower() in ['youtube', 'youtubetab']
-        except:
+            ydl = self._shared_ydl('validate', extract_flat=False, socket_timeout=5)
+            info = ydl.extract_info(url, download=False, process=False)
+            return (info.get('extractor_key') or '').lower() in ['youtube', 'youtubetab']
+        except (yt_dlp.utils.DownloadError, OSError, ValueError):
             return False
 
-    def _verify_merged_streams(self, file_path: str) -> dict:
-        """Verify the output file has both video and audio streams using ffprobe."""
-        import subprocess
-
-        ffprobe = 'ffprobe'
-        if self.ffmpeg_dir:
-            ffprobe_path = os.path.join(self.ffmpeg_dir, 'ffprobe')
-            if os.path.exists(ffprobe_path) or os.path.exists(ffprobe_path + '.exe'):
-                ffprobe = ffprobe_path
+    def _probe_streams(self, file_path: str) -> Optional[Tuple[Tuple[str, str], ...]]:
+        """(codec_type, codec_name) for each stream of a file, or None if it can't be probed.
 
-        result = {"has_video": False, "has_audio": False, "video_codec": None, "audio_codec": None}
+        Verify, fallback merge and the H.264 check all ask about the same files,
+        so each version of a file (path, mtime, size) is probed only once.
+        """
         try:
-            proc = subprocess.run(
-                [ffprobe, '-v', 'quiet', '-show_streams', '-of', 'json', file_path],
-                capture_output=True, text=True, timeout=15
-            )
-            if proc.returncode != 0:
-                logger.warning("ffprobe failed for %s: %s", file_path, proc.stderr)
-                return result
-
-            import json
-            data = json.loads(proc.stdout)
-            for stream in data.get('streams', []):
-                if stream.get('codec_type') == 'video':
-                    result['has_video'] = True
-                    result['video_codec'] = stream.get('codec_name')
-                elif stream.get('codec_type') == 'audio':
-                    result['has_audio'] = True
-                    result['audio_codec'] = stream.get('codec_name')
-
-            logger.info(
-                "Stream verify for %s: video=%s(%s) audio=%s(%s)",
-                os.path.basename(file_path),
-                result['has_video'], result['video_codec'],
-                result['has_audio'], result['audio_codec'],
-            )
+            st = os.stat(file_path)
+        except OSError as e:
+            logger.warning("Cannot probe %s: %s", file_path, e)
+            return None
+        try:
+            return _probe_cached(self._ffprobe_bin, file_path, st.st_mtime_ns, st.st_size)
         except Exception as e:
-            logger.warning("Stream verification failed: %s", e)
+            logger.warning("ffprobe failed for %s: %s", file_path, e)
+            return None
+
+    def _verify_merged_streams(self, file_path: str) -> dict:
+        """Verify the output file has both video and audio streams using ffprobe."""
+        result = {"has_video": False, "has_audio": False, "video_codec": None, "audio_codec": None}
+        streams = self._probe_streams(file_path)
+        if streams is None:
+            return result
 
+        for codec_type, codec_name in streams:
+            if codec_type == 'video' and not result['has_video']:
+                result['has_video'] = True
+                result['video_codec'] = codec_name or None
+            elif codec_type == 'audio' and not result['has_audio']:
+                result['has_audio'] = True
+                result['audio_codec'] = codec_name or None
+
+        logger.info(
+            "Stream verify for %s: video=%s(%s) audio=%s(%s)",
+            os.path.basename(file_path),
+            result['has_video'], result['video_codec'],
+            result['has_audio'], result['audio_codec'],
+        )
         return result
 
-    def _merge_streams_fallback(self, target_dir: str, download_id: str, format: str) -> Optional[str]:
+    @staticmethod
+    def _normalize_codec(ytdlp_codec: Optional[str]) -> Optional[str]:
+        """Map a yt-dlp codec string (e.g. 'avc1.64001F', 'vp09.00.40.08') to ffprobe's name, or None."""
+        codec = (ytdlp_codec or '').lower()
+        if codec.startswith(('avc1', 'avc3', 'h264')):
+            return 'h264'
+        if codec.startswith(('vp09', 'vp9')):
+            return 'vp9'
+        if codec.startswith(('av01', 'av1')):
+            return 'av1'
+        if codec.startswith('mp4a'):
+            return 'aac'
+        if codec.startswith('opus'):
+            return 'opus'
+        return None
+
+    def _trusted_streams(self, quality: str, format: str, info: Dict) -> Optional[dict]:
+        """Stream info from yt-dlp's metadata when the ffprobe verify can be skipped, else None."""
+        video_codec = self._normalize_codec(info.get('vcodec'))
+        audio_codec = self._normalize_codec(info.get('acodec'))
+        if not video_codec or not audio_codec:
+            return None  # yt-dlp itself isn't sure both streams are there
+
+        with self._verify_lock:
+            ok, total = self._verify_stats.get((quality, format), (0, 0))
+            if total < _VERIFY_TRUST_MIN or ok / total <= _VERIFY_TRUST_RATE:
+                return None
+            self._verify_skips += 1
+            if self._verify_skips % _VERIFY_SAMPLE_EVERY == 0:
+                return None  # keep sampling so a regression still shows up in the stats
+
+        return {"has_video": True, "has_audio": True, "video_codec": video_codec, "audio_codec": audio_codec}
+
+    def _record_verify(self, quality: str, format: str, ok: bool):
+        with self._verify_lock:
+            stats = self._verify_stats.setdefault((quality, format), [0, 0])
+            stats[0] += ok
+            stats[1] += 1
+            if stats[1] >= _VERIFY_WINDOW:
+                stats[0] //= 2
+                stats[1] //= 2
+
+    def _merge_streams_fallback(self, target_dir: str, download_id: str, format: str,
+                                entries: Optional[Dict[str, os.DirEntry]] = None) -> Optional[str]:
         """Manually merge separate video+audio files if yt-dlp's auto-merge failed."""
-        import subprocess
+        ffmpeg_bin = self._ffmpeg_bin
 
-        ffmpeg_bin = 'ffmpeg'
-        if self.ffmpeg_dir:
-            candidate = os.path.join(self.ffmpeg_dir, 'ffmpeg')
-            if os.path.exists(candidate) or os.path.exists(candidate + '.exe'):
-                ffmpeg_bin = candidate
+        if entries is None:
+            entries = scan_download_files(target_dir, download_id)
 
         # Find separate stream files: {download_id}.f{N}.{ext}
         video_file = None
         audio_file = None
-        for f in os.listdir(target_dir):
-            if not f.startswith(download_id) or f.endswith('.part'):
+        for f, entry in entries.items():
+            if f.endswith('.part'):
                 continue
-            path = os.path.join(target_dir, f)
+            path = entry.path
             parts = f[len(download_id):]  # e.g. ".f137.webm"
             if parts.count('.') <= 1:
                 continue  # This is the final merged file, skip it
             # Probe this file to check if it's video or audio
-            try:
-                proc = subprocess.run(
-                    [ffmpeg_bin.replace('ffmpeg', 'ffprobe'), '-v', 'quiet',
-                     '-show_entries', 'stream=codec_type', '-of', 'csv=p=0', path],
-                    capture_output=True, text=True, timeout=10
-                )
-                types = proc.stdout.strip().split('\n')
+            streams = self._probe_streams(path)
+            if streams is not None:
+                types = {codec_type for codec_type, _ in streams}
                 if 'video' in types and not video_file:
                     video_file = path
                 elif 'audio' in types and not audio_file:
                     audio_file = path
-            except Exception:
+            else:
                 # Guess by extension
                 ext_lower = os.path.splitext(f)[1].lower()
                 if ext_lower in ('.m4a', '.ogg', '.opus', '.weba') and not audio_file:
@@ -394,75 +634,114 @@ class YouTubeService:
     def _cleanup_intermediate_files(self, target_dir: str, download_id: str, final_file: str):
         """Remove leftover intermediate stream files (e.g. .f137.webm, .f140.m4a)."""
         final_basename = os.path.basename(final_file)
-        for f in os.listdir(target_dir):
-            if f.startswith(download_id) and f != final_basename:
-                path = os.path.join(target_dir, f)
+        for f, entry in scan_download_files(target_dir, download_id).items():
+            if f != final_basename:
                 try:
-                    os.remove(path)
+                    os.remove(entry.path)
                     logger.info("Cleaned up intermediate file: %s", f)
                 except OSError as e:
                     logger.warning("Failed to clean up %s: %s", f, e)
 
-    def _ensure_mp4_h264(self, file_path: str) -> str:
-        """Check if an MP4 file has H.264 video. If not (VP9/AV1), re-encode to H.264."""
-        import subprocess
-
-        ffprobe = 'ffprobe'
-        if self.ffmpeg_dir:
-            ffprobe_path = os.path.join(self.ffmpeg_dir, 'ffprobe')
-            if os.path.exists(ffprobe_path) or os.path.exists(ffprobe_path + '.exe'):
-                ffprobe = ffprobe_path
-
-        try:
-            result = subprocess.run(
-                [ffprobe, '-v', 'quiet', '-select_streams', 'v:0',
-                 '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', file_path],
-                capture_output=True, text=True, timeout=10
-            )
-            codec = result.stdout.strip()
-            logger.info("MP4 video codec: %s for %s", codec, os.path.basename(file_path))
-
-            if codec in ('h264', 'avc1', ''):
-                return file_path  # Already H.264 or unknown — leave it
-        except Exception as e:
-            logger.warning("ffprobe check failed: %s", e)
-            return file_path  # Can't check — leave it
+    @staticmethod
+    def _run_ffmpeg(cmd: List[str], duration: Optional[float] = None,
+                    progress_callback: Optional[Callable] = None, timeout: float = 600) -> Tuple[int, bytes]:
+        """Run ffmpeg and return (returncode, stderr).
 
-        # Re-encode VP9/AV1 to H.264
+        With a progress_callback, ffmpeg's -progress output is forwarded as
+        {'status': 'reencoding', 'fraction': 0..1 or None} events. If the
+        callback raises (user cancel), ffmpeg is killed at once and the
+        exception propagates instead of the encode running to completion.
+        """
+        if progress_callback:
+            cmd = [cmd[0], '-progress', 'pipe:1', *cmd[1:]]
+        # stderr goes to a temp file: a chatty failure can't fill a pipe and stall the progress reads
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stderr=err,
+                                    stdout=subprocess.PIPE if progress_callback else subprocess.DEVNULL)
+            watchdog = threading.Timer(timeout, proc.kill)
+            watchdog.start()
+            try:
+                if progress_callback:
+                    fraction = None
+                    for line in proc.stdout:
+                        key, _, value = line.strip().partition(b'=')
+                        if key == b'out_time_us' and duration:
+                            try:
+                                fraction = min(int(value) / 1e6 / duration, 1.0)
+                            except ValueError:  # "N/A" before the first packet
+                                pass
+                        elif key == b'progress':  # end of one progress block
+                            progress_callback({'status': 'reencoding', 'fraction': fraction})
+                proc.wait()
+            except BaseException:
+                proc.kill()
+                proc.wait()
+                raise
+            finally:
+                watchdog.cancel()
+            err.seek(0)
+            return proc.returncode, err.read()
+
+    def _ensure_mp4_h264(self, file_path: str, codec: Optional[str] = None, duration: Optional[float] = None,
+                         progress_callback: Optional[Callable] = None) -> str:
+        """Check if an MP4 file has H.264 video. If not (VP9/AV1), re-encode to H.264.
+
+        Pass `codec` when a previous probe of this file already found it, and
+        `duration` (seconds) so re-encode progress can report a fraction.
+        """
+        if codec is None:
+            streams = self._probe_streams(file_path)
+            if streams is None:
+                return file_path  # Can't check — leave it
+            codec = next((name for codec_type, name in streams if codec_type == 'video'), '')
+        logger.info("MP4 video codec: %s for %s", codec, os.path.basename(file_path))
+
+        if codec in ('h264', 'avc1', ''):
+            return file_path  # Already H.264 or unknown — leave it
+
+        # Re-encode VP9/AV1 to H.264, on the GPU when one is configured
         logger.info("Re-encoding %s from %s to H.264", os.path.basename(file_path), codec)
-        fixed_path = file_path.replace('.mp4', '_fixed.mp4')
-
-        ffmpeg_bin = 'ffmpeg'
-        if self.ffmpeg_dir:
-            ffmpeg_candidate = os.path.join(self.ffmpeg_dir, 'ffmpeg')
-            if os.path.exists(ffmpeg_candidate) or os.path.exists(ffmpeg_candidate + '.exe'):
-                ffmpeg_bin = ffmpeg_candidate
-
+        fixed_path = os.path.splitext(file_path)[0] + '_fixed.mp4'
+
+        ffmpeg_bin = self._ffmpeg_bin
+        quiet = ['-hide_banner', '-nostats', '-loglevel', 'error']
+        attempts = []
+        if self._hw_encoder:
+            encoder, in_args, out_args = HW_ENCODERS[self._hw_encoder]
+            attempts.append((encoder, [ffmpeg_bin, *quiet, *in_args, '-i', file_path, '-c:v', encoder, *out_args,
+                                       '-c:a', 'copy', *REENCODE_MUX_ARGS, '-y', fixed_path]))
+        attempts.append(('libx264', [ffmpeg_bin, *quiet, '-i', file_path, '-c:v', 'libx264', '-preset', 'fast',
+                                     '-crf', '23', '-c:a', 'copy', *REENCODE_MUX_ARGS, '-y', fixed_path]))
+
+        # Only ffmpeg/filesystem errors keep the original; a raising progress_callback (cancel) propagates
         try:
-            subprocess.run(
-                [ffmpeg_bin, '-i', file_path, '-c:v', 'libx264', '-preset', 'fast',
-                 '-crf', '23', '-c:a', 'copy', '-y', fixed_path],
-                capture_output=True, timeout=600
-            )
+            with REENCODE_SLOTS:
+                for label, cmd in attempts:
+                    returncode, stderr = self._run_ffmpeg(cmd, duration, progress_callback)
+                    if returncode == 0:
+                        break
+                    lines = stderr.decode(errors='replace').strip().splitlines()
+                    logger.warning("Re-encode with %s failed (exit %d): %s", label, returncode,
+                                   lines[-1] if lines else 'no error output')
             if os.path.exists(fixed_path) and os.path.getsize(fixed_path) > 0:
-                os.remove(file_path)
-                os.rename(fixed_path, file_path)
+                os.replace(fixed_path, file_path)
                 logger.info("Re-encode complete: %s", os.path.basename(file_path))
             else:
                 logger.warning("Re-encode produced empty file, keeping original")
-                if os.path.exists(fixed_path):
-                    os.remove(fixed_path)
-        except Exception as e:
+        except (OSError, subprocess.SubprocessError) as e:
             logger.error("Re-encode failed: %s", e)
+        finally:
             if os.path.exists(fixed_path):
                 os.remove(fixed_path)
 
         return file_path
 
-    def _sanitize_filename(self, name: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _sanitize_filename(name: str) -> str:
         """Sanitize a string for use as a filename."""
-        name = re.sub(r'[<>:"/\\|?*]', '', name)
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = _SANITIZE_BAD_RE.sub('', name)
+        name = _SANITIZE_WS_RE.sub(' ', name).strip()
         if len(name) > 200:
             name = name[:200].strip()
         return name or 'untitled'
@@ -471,51 +750,46 @@ class YouTubeService:
         """Rename a downloaded file from UUID to the video title. Returns new path."""
         if not title or not os.path.exists(file_path):
             return file_path
-
         target_dir = os.path.dirname(file_path)
         ext = os.path.splitext(file_path)[1]
         safe_title = self._sanitize_filename(title)
-        new_path = os.path.join(target_dir, f"{safe_title}{ext}")
-
-        # Handle duplicates
-        if os.path.exists(new_path) and os.path.abspath(new_path) != os.path.abspath(file_path):
-            counter = 1
-            while os.path.exists(new_path):
-                new_path = os.path.join(target_dir, f"{safe_title} ({counter}){ext}")
-                counter += 1
-
+        new_path = None
         try:
-            os.rename(file_path, new_path)
+            new_path = unique_path(target_dir, safe_title, ext, current=os.path.basename(file_path))
+            # new_path is already reserved, so replace it rather than checking again
+            os.replace(file_path, new_path)
             logger.info("Renamed: %s -> %s", os.path.basename(file_path), os.path.basename(new_path))
             return new_path
         except Exception as e:
             logger.warning("Failed to rename file: %s", e)
+            if new_path and new_path != file_path and os.path.exists(file_path):
+                try:
+                    os.remove(new_path)  # drop the empty placeholder
+                except OSError:
+                    pass
             return file_path
 
-    def _find_output_file(self, target_dir: str, download_id: str, expected_ext: str) -> Optional[str]:
+    def _find_output_file(self, target_dir: str, download_id: str, expected_ext: str,
+                          entries: Optional[Dict[str, os.DirEntry]] = None) -> Optional[str]:
         """Find the actual output file, preferring the expected extension."""
-        # First: look for the exact expected file
-        expected_path = os.path.join(target_dir, f'{download_id}.{expected_ext}')
-        if os.path.exists(expected_path):
-            return expected_path
-
-        # Second: look for any file matching the download_id (skip .part and intermediate files)
-        candidates = []
-        for f in os.listdir(target_dir):
-            if f.startswith(download_id) and not f.endswith('.part'):
-                # Skip intermediate stream files like {id}.f137.webm, {id}.f140.m4a
-                parts = f[len(download_id):]  # e.g. ".mp4" or ".f137.webm"
-                if parts.count('.') <= 1:  # final file has just one dot: ".mp4"
-                    candidates.append(os.path.join(target_dir, f))
-
-        # If no clean candidates, accept any matching file
-        if not candidates:
-            for f in os.listdir(target_dir):
-                if f.startswith(download_id) and not f.endswith('.part'):
-                    candidates.append(os.path.join(target_dir, f))
-
-        # Return the largest file (the merged output is always the biggest)
-        if candidates:
-            return max(candidates, key=os.path.getsize)
-
-        return None
+        if entries is None:
+            entries = scan_download_files(target_dir, download_id)
+
+        # First: the exact expected file
+        expected = entries.get(f'{download_id}.{expected_ext}')
+        if expected is not None:
+            return expected.path
+
+        # Otherwise the largest file (the merged output is always the biggest), preferring
+        # final files — one dot, ".mp4" — over intermediates like ".f137.webm"; skip .part
+        best = best_any = None  # (size, path)
+        for f, entry in entries.items():
+            if f.endswith('.part'):
+                continue
+            size = entry.stat().st_size
+            if best_any is None or size > best_any[0]:
+                best_any = (size, entry.path)
+            if f[len(download_id):].count('.') <= 1 and (best is None or size > best[0]):
+                best = (size, entry.path)
+        pick = best or best_any
+        return pick[1] if pick else None
@@ -8,12 +8,17 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     DOWNLOAD_DIR: str
     FFMPEG_PATH: str = ""
+    HWACCEL: str = ""  # H.264 re-encode: "", "auto", "nvenc", "qsv", "vaapi" or "videotoolbox"
+    MP4_STRICT_H264: bool = True  # re-encode VP9/AV1 YouTube MP4s to H.264 for players that need it
+    YTDLP_CACHE_DIR: str = ""  # yt-dlp's player/signature cache; "" keeps its default (~/.cache/yt-dlp)
     MAX_FILE_SIZE_MB: int
     MAX_DOWNLOADS_PER_DAY_FREE: int
     MAX_DOWNLOADS_PER_DAY_BASIC: int
     MAX_DOWNLOADS_PER_DAY_PRO: int
+    MAX_CONCURRENT_DOWNLOADS: int = 4  # background download jobs running at once; the rest queue
     CORS_ORIGINS: str = "http://localhost:3000"
     ADMIN_EMAIL: str = ""
+    DB_POOL_WARMUP: int = 4  # connections opened at startup so the first requests skip the connect handshake
 
     class Config:
         env_file = ".env"
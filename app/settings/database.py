@@ -6,10 +6,11 @@ from typing import Generator
 engine = create_engine(
     settings.DATABASE_URL,
     echo=False,
-    pool_pre_ping=True,
+    # Recycling before typical server/proxy idle timeouts replaces the per-checkout SELECT 1 of pool_pre_ping
+    pool_pre_ping=False,
     pool_size=10,
     max_overflow=20,
-    pool_recycle=1800,
+    pool_recycle=300,
     pool_timeout=30,
 )
 
@@ -23,31 +24,34 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+# Bump when adding a step to the reflection-based upgrade block in _upgrade_schema
+SCHEMA_VERSION = 1
+
+def warm_pool():
+    """Open up to DB_POOL_WARMUP pooled connections so early requests don't pay for connecting."""
+    from contextlib import ExitStack
+    from sqlalchemy import text
+
+    with ExitStack() as stack:
+        # Hold them all at once, otherwise the pool would hand back the same connection each time
+        for _ in range(min(settings.DB_POOL_WARMUP, engine.pool.size())):
+            conn = stack.enter_context(engine.connect())
+            conn.execute(text("SELECT 1"))
+
 def init_db():
     Base.metadata.create_all(bind=engine)
 
-    # Add missing columns to existing tables
-    from sqlalchemy import inspect, text
-    inspector = inspect(engine)
+    from sqlalchemy import text
 
     with engine.begin() as conn:
-        if inspector.has_table("users"):
-            columns = [col["name"] for col in inspector.get_columns("users")]
-            if "download_path" not in columns:
-                conn.execute(text("ALTER TABLE users ADD COLUMN download_path VARCHAR"))
-            if "is_premium" not in columns:
-                conn.execute(text("ALTER TABLE users ADD COLUMN is_premium BOOLEAN DEFAULT FALSE"))
-            if "is_admin" not in columns:
-                conn.execute(text("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE"))
-            if "instagram_cookie" not in columns:
-                conn.execute(text("ALTER TABLE users ADD COLUMN instagram_cookie VARCHAR"))
-
-        if inspector.has_table("download_history"):
-            columns = [col["name"] for col in inspector.get_columns("download_history")]
-            if "file_path" not in columns:
-                conn.execute(text("ALTER TABLE download_history ADD COLUMN file_path VARCHAR"))
-            if "ip_address" not in columns:
-                conn.execute(text("ALTER TABLE download_history ADD COLUMN ip_address VARCHAR"))
+        # Reflecting every column/index/constraint costs several round-trips; do it once per schema version
+        conn.execute(text("CREATE TABLE IF NOT EXISTS _schema_migrations (version INTEGER PRIMARY KEY)"))
+        applied = conn.execute(
+            text("SELECT 1 FROM _schema_migrations WHERE version = :v"), {"v": SCHEMA_VERSION}
+        ).first()
+        if not applied:
+            _upgrade_schema(conn)
+            conn.execute(text("INSERT INTO _schema_migrations (version) VALUES (:v)"), {"v": SCHEMA_VERSION})
 
         # Auto-promote admin by email
         if settings.ADMIN_EMAIL:
@@ -56,16 +60,39 @@ def init_db():
                 {"email": settings.ADMIN_EMAIL},
             )
 
-        # Drop unique constraint/index on username (allow duplicate usernames)
-        if inspector.has_table("users"):
-            # Drop unique constraints
-            unique_constraints = inspector.get_unique_constraints("users")
-            for uc in unique_constraints:
-                if "username" in uc.get("column_names", []):
-                    conn.execute(text(f'ALTER TABLE users DROP CONSTRAINT "{uc["name"]}"'))
+def _upgrade_schema(conn):
+    # Add missing columns to existing tables
+    from sqlalchemy import inspect, text
+    inspector = inspect(conn)
+
+    if inspector.has_table("users"):
+        columns = [col["name"] for col in inspector.get_columns("users")]
+        if "download_path" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN download_path VARCHAR"))
+        if "is_premium" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN is_premium BOOLEAN DEFAULT FALSE"))
+        if "is_admin" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE"))
+        if "instagram_cookie" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN instagram_cookie VARCHAR"))
+
+    if inspector.has_table("download_history"):
+        columns = [col["name"] for col in inspector.get_columns("download_history")]
+        if "file_path" not in columns:
+            conn.execute(text("ALTER TABLE download_history ADD COLUMN file_path VARCHAR"))
+        if "ip_address" not in columns:
+            conn.execute(text("ALTER TABLE download_history ADD COLUMN ip_address VARCHAR"))
+
+    # Drop unique constraint/index on username (allow duplicate usernames)
+    if inspector.has_table("users"):
+        # Drop unique constraints
+        unique_constraints = inspector.get_unique_constraints("users")
+        for uc in unique_constraints:
+            if "username" in uc.get("column_names", []):
+                conn.execute(text(f'ALTER TABLE users DROP CONSTRAINT "{uc["name"]}"'))
 
-            # Drop unique indexes (PostgreSQL often uses these instead of constraints)
-            indexes = inspector.get_indexes("users")
-            for idx in indexes:
-                if idx.get("unique") and "username" in idx.get("column_names", []):
-                    conn.execute(text(f'DROP INDEX IF EXISTS "{idx["name"]}"'))
\ No newline at end of file
+        # Drop unique indexes (PostgreSQL often uses these instead of constraints)
+        indexes = inspector.get_indexes("users")
+        for idx in indexes:
+            if idx.get("unique") and "username" in idx.get("column_names", []):
+                conn.execute(text(f'DROP INDEX IF EXISTS "{idx["name"]}"'))
@@ -21,10 +21,12 @@ function formatEta(seconds) {
 }
 
 const PHASE_LABELS = {
+  queued: 'Waiting in queue',
   starting: 'Starting...',
   downloading_video: 'Downloading video',
   downloading_audio: 'Downloading audio',
   merging: 'Merging streams',
+  reencoding: 'Converting to H.264',
   converting: 'Converting audio',
   done: 'Complete',
   error: 'Failed',
@@ -597,9 +599,11 @@ export default function DownloadPage() {
             <span className="text-gray-300 font-medium min-w-0 truncate">
               {isBatchDone
                 ? 'Batch complete'
-                : batchProgress.current_title
-                  ? `Downloading: ${batchProgress.current_title}`
-                  : `Downloading ${batchProgress.completed + 1} of ${batchProgress.total}...`}
+                : batchProgress.phase === 'queued'
+                  ? 'Waiting in queue...'
+                  : batchProgress.current_title
+                    ? `Downloading: ${batchProgress.current_title}`
+                    : `Downloading ${batchProgress.completed + 1} of ${batchProgress.total}...`}
             </span>
             <span className="text-white font-semibold shrink-0">
               {batchProgress.completed}/{batchProgress.total}
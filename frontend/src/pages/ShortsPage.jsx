@@ -249,9 +249,11 @@ export default function ShortsPage() {
             <span className="text-gray-300 font-medium">
               {isDone
                 ? 'Batch complete'
-                : batchProgress.current_title
-                  ? `Downloading: ${batchProgress.current_title}`
-                  : `Downloading ${batchProgress.completed + 1} of ${batchProgress.total}...`}
+                : batchProgress.phase === 'queued'
+                  ? 'Waiting in queue...'
+                  : batchProgress.current_title
+                    ? `Downloading: ${batchProgress.current_title}`
+                    : `Downloading ${batchProgress.completed + 1} of ${batchProgress.total}...`}
             </span>
             <span className="text-white font-semibold">
               {batchProgress.completed}/{batchProgress.total}
@@ -22,6 +22,7 @@ function formatEta(seconds) {
 }
 
 const PHASE_LABELS = {
+  queued: 'Waiting in queue',
   starting: 'Starting...',
   downloading: 'Downloading',
   downloading_audio: 'Downloading audio',
@@ -744,9 +745,11 @@ export default function TikTokPage() {
             <span className="text-gray-300 font-medium min-w-0 truncate">
               {isBatchDone
                 ? 'Batch complete'
-                : batchProgress.current_title
-                  ? `Downloading: ${batchProgress.current_title}`
-                  : `Downloading ${batchProgress.completed + 1} of ${batchProgress.total}...`}
+                : batchProgress.phase === 'queued'
+                  ? 'Waiting in queue...'
+                  : batchProgress.current_title
+                    ? `Downloading: ${batchProgress.current_title}`
+                    : `Downloading ${batchProgress.completed + 1} of ${batchProgress.total}...`}
             </span>
             <span className="text-white font-semibold shrink-0">
               {batchProgress.completed}/{batchProgress.total}
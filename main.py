@@ -1,13 +1,16 @@
+import asyncio
 import logging
+import re
 import shutil
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy import text
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from app.settings.config import settings
-from app.settings.database import init_db, SessionLocal
+from app.settings.database import init_db, engine, warm_pool
 from app.routes.auth import router as auth_router
 from app.routes.download import router as download_router
 from app.routes.user import router as user_router
@@ -45,12 +48,11 @@ exact_origins = [o for o in cors_origins if "*" not in o]
 wildcard_patterns = [o for o in cors_origins if "*" in o]
 
 # Convert wildcard patterns to regex (e.g. https://*.ngrok-free.app -> https://.*\.ngrok-free\.app)
-import re as _re
 origin_regex = None
 if wildcard_patterns:
     regex_parts = []
     for pattern in wildcard_patterns:
-        escaped = _re.escape(pattern).replace(r"\*", ".*")
+        escaped = re.escape(pattern).replace(r"\*", ".*")
         regex_parts.append(escaped)
     origin_regex = "^(" + "|".join(regex_parts) + ")$"
 
@@ -68,30 +70,35 @@ app.add_middleware(
 @app.on_event("startup")
 def startup():
     init_db()
+    try:
+        warm_pool()
+    except Exception as e:
+        logger.warning("DB pool warmup failed: %s", e)
     logger.info("TurboClip API started")
 
 # --- Health Check ---
+# PATH doesn't change while the process runs; resolve ffmpeg once instead of on every probe
+_FFMPEG_PATH = settings.FFMPEG_PATH or shutil.which("ffmpeg")
+
+
+def _ping_db():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
 @app.get("/health")
-def health_check():
+async def health_check():
     status = {"api": "healthy"}
 
-    # Check database
+    # Check database (pooled connection, no ORM session; off the event loop)
     try:
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
+        await asyncio.to_thread(_ping_db)
         status["database"] = "healthy"
     except Exception:
         status["database"] = "unhealthy"
 
     # Check FFmpeg
-    ffmpeg_path = shutil.which("ffmpeg")
-    if settings.FFMPEG_PATH:
-        status["ffmpeg"] = settings.FFMPEG_PATH
-    elif ffmpeg_path:
-        status["ffmpeg"] = ffmpeg_path
-    else:
-        status["ffmpeg"] = "not found"
+    status["ffmpeg"] = _FFMPEG_PATH or "not found"
 
     return status
 